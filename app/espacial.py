@@ -0,0 +1,179 @@
+"""
+Índice espacial em memória das posições atuais da frota.
+
+As últimas posições de cada veículo ficam numa grade de células de
+TAMANHO_CELULA graus; a consulta por retângulo (viewport do mapa) só olha
+as células que cruzam o retângulo e a de vizinhos mais próximos percorre
+anéis de células a partir do ponto. O índice é refeito a partir de
+Localizacao.ultimas_por_veiculo() quando passa do TTL ou quando é
+invalidado; as ingestões deste processo movem os veículos gravados de
+célula sem refazer o resto (atualizar()).
+"""
+
+import heapq
+import math
+import threading
+import time
+
+from app import db
+from app.models import Localizacao
+
+
+# Lado da célula em graus (~1,1 km em Fortaleza)
+TAMANHO_CELULA = 0.01
+
+# Segundos até o índice ser refeito a partir do banco
+TTL_INDICE = 5.0
+
+METROS_POR_GRAU = 111195.0
+
+
+def distancia_m(lat1, lon1, lat2, lon2):
+    """Distância haversine em metros."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * 6371008.8 * math.asin(math.sqrt(min(1.0, a)))
+
+
+class IndiceEspacial:
+
+    def __init__(self, tamanho_celula=TAMANHO_CELULA, ttl=TTL_INDICE):
+        self.tamanho_celula = tamanho_celula
+        self.ttl = ttl
+        self._celulas = None
+        self._posicoes = {}  # veiculo_id -> (timestamp, célula, item)
+        self._total = 0
+        self._carregado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _celula(self, lat, lon):
+        return (math.floor(lat / self.tamanho_celula), math.floor(lon / self.tamanho_celula))
+
+    def invalidar(self):
+        with self._lock:
+            self._celulas = None
+
+    def _atual(self):
+        """Retorna a grade vigente, refazendo-a se estiver vazia ou expirada."""
+        with self._lock:
+            if self._celulas is not None and time.monotonic() - self._carregado_em <= self.ttl:
+                return self._celulas
+
+            celulas = {}
+            posicoes = {}
+            for loc in Localizacao.ultimas_por_veiculo():
+                item = loc.to_dict()
+                celula = self._celula(loc.latitude, loc.longitude)
+                celulas.setdefault(celula, []).append(item)
+                posicoes[loc.veiculo_id] = (loc.timestamp, celula, item)
+            self._celulas = celulas
+            self._posicoes = posicoes
+            self._total = len(posicoes)
+            self._carregado_em = time.monotonic()
+            return celulas
+
+    def atualizar(self, linhas):
+        """
+        Aplica as linhas recém-gravadas (dicts com veiculo_id, latitude,
+        longitude e timestamp) à grade já carregada, movendo cada veículo
+        para a célula da posição mais nova. O id da linha não é conhecido
+        (COPY/executemany) e fica None até a próxima recarga.
+        """
+        with self._lock:
+            if self._celulas is None:
+                return
+            for linha in linhas:
+                veiculo_id = linha["veiculo_id"]
+                anterior = self._posicoes.get(veiculo_id)
+                if anterior is not None and linha["timestamp"] < anterior[0]:
+                    continue
+
+                if anterior is not None:
+                    itens = self._celulas[anterior[1]]
+                    itens.remove(anterior[2])
+                    if not itens:
+                        del self._celulas[anterior[1]]
+                item = {
+                    "id": linha.get("id"),
+                    "veiculo_id": veiculo_id,
+                    "latitude": linha["latitude"],
+                    "longitude": linha["longitude"],
+                    "timestamp": linha["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                celula = self._celula(linha["latitude"], linha["longitude"])
+                self._celulas.setdefault(celula, []).append(item)
+                self._posicoes[veiculo_id] = (linha["timestamp"], celula, item)
+            self._total = len(self._posicoes)
+
+    def no_retangulo(self, min_lat, min_lon, max_lat, max_lon):
+        """Posições atuais dentro do retângulo (bordas inclusas)."""
+        celulas = self._atual()
+        lat_i, lon_i = self._celula(min_lat, min_lon)
+        lat_f, lon_f = self._celula(max_lat, max_lon)
+
+        # Retângulo maior que a grade ocupada: mais barato varrer as células existentes
+        if (lat_f - lat_i + 1) * (lon_f - lon_i + 1) > len(celulas):
+            candidatas = celulas.values()
+        else:
+            candidatas = [celulas[(i, j)]
+                          for i in range(lat_i, lat_f + 1)
+                          for j in range(lon_i, lon_f + 1)
+                          if (i, j) in celulas]
+
+        return [item
+                for itens in candidatas
+                for item in itens
+                if min_lat <= item["latitude"] <= max_lat and min_lon <= item["longitude"] <= max_lon]
+
+    def mais_proximos(self, lat, lon, k=5):
+        """
+        Os k veículos mais próximos do ponto, do mais perto ao mais longe,
+        com a distância em metros em "distancia_m".
+        """
+        celulas = self._atual()
+        centro_i, centro_j = self._celula(lat, lon)
+        # Menor largura de uma célula em metros (a longitude encolhe com a latitude)
+        largura_m = self.tamanho_celula * METROS_POR_GRAU * max(math.cos(math.radians(abs(lat) + 1)), 0.01)
+
+        candidatos = []  # (distancia, veiculo_id, item)
+        vistos = 0
+        anel = 0
+        while vistos < self._total:
+            if 8 * anel > len(celulas):
+                # Anel com mais células que a grade ocupada: mede todos de uma vez
+                candidatos = [(distancia_m(lat, lon, item["latitude"], item["longitude"]),
+                               item["veiculo_id"], item)
+                              for itens in celulas.values() for item in itens]
+                break
+
+            for celula in _anel(centro_i, centro_j, anel):
+                for item in celulas.get(celula, ()):
+                    vistos += 1
+                    candidatos.append((distancia_m(lat, lon, item["latitude"], item["longitude"]),
+                                       item["veiculo_id"], item))
+
+            # Qualquer ponto fora dos anéis já vistos está a pelo menos anel * largura
+            candidatos = heapq.nsmallest(k, candidatos)
+            if len(candidatos) >= k and candidatos[-1][0] <= anel * largura_m:
+                break
+            anel += 1
+
+        return [dict(item, distancia_m=round(d, 1)) for d, _, item in heapq.nsmallest(k, candidatos)]
+
+
+def _anel(centro_i, centro_j, anel):
+    """Células na borda do quadrado de raio `anel` em torno do centro."""
+    if anel == 0:
+        yield (centro_i, centro_j)
+        return
+    for j in range(centro_j - anel, centro_j + anel + 1):
+        yield (centro_i - anel, j)
+        yield (centro_i + anel, j)
+    for i in range(centro_i - anel + 1, centro_i + anel):
+        yield (i, centro_j - anel)
+        yield (i, centro_j + anel)
+
+
+indice_posicoes = IndiceEspacial()
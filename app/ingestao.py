@@ -0,0 +1,444 @@
+import atexit
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+
+from app import app, db
+from app.models import Veiculo, Localizacao
+
+
+# Limites aproximados de Fortaleza
+LAT_MIN, LAT_MAX = -3.85, -3.70
+LON_MIN, LON_MAX = -38.60, -38.50
+
+# Quantidade de pontos validados e gravados por vez
+TAMANHO_LOTE = 5000
+
+# Quantidade máxima de erros detalhados devolvidos na resposta
+MAX_ERROS_RELATORIO = 100
+
+# Fila de gravação assíncrona (write-behind), configurável pelo .env
+FILA_CAPACIDADE = int(os.getenv("INGESTAO_FILA_CAPACIDADE", 100000))
+FILA_LOTE = int(os.getenv("INGESTAO_FILA_LOTE", 2000))
+FILA_INTERVALO = float(os.getenv("INGESTAO_FILA_INTERVALO", 1.0))
+FILA_DERRAMAR_DIR = os.getenv("INGESTAO_FILA_DERRAMAR_DIR") or os.path.join(tempfile.gettempdir(), "ingestao")
+
+# Tentativas de gravar um lote antes de descartá-lo
+TENTATIVAS_GRAVACAO = 3
+
+
+def ler_pontos(req):
+    """
+    Lê os pontos do corpo da requisição sem montar tudo em memória quando
+    possível. Aceita:
+      - NDJSON (application/x-ndjson): um objeto JSON por linha, lido do stream
+      - JSON: uma lista de pontos ou {"pontos": [...]}
+    """
+    tipo = (req.mimetype or "").lower()
+    if tipo in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return _ler_ndjson(req.stream)
+
+    dados = req.get_json(silent=True)
+    if isinstance(dados, dict):
+        dados = dados.get("pontos")
+    if not isinstance(dados, list):
+        raise ValueError("Envie uma lista JSON de pontos ou NDJSON")
+    return iter(dados)
+
+
+def _ler_ndjson(stream):
+    for linha in stream:
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield json.loads(linha)
+        except ValueError:
+            # Mantém a posição da linha para o relatório de erros
+            yield None
+
+
+def _converter_timestamp(valor):
+    if valor is None or valor == "":
+        return datetime.utcnow()
+    if isinstance(valor, bool):
+        # bool é subclasse de int; True/False não são um epoch
+        raise ValueError("timestamp booleano")
+    if isinstance(valor, (int, float)):
+        return datetime.utcfromtimestamp(valor)
+
+    momento = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return momento
+
+
+def validar_ponto(ponto, ids_validos, ids_por_placa):
+    """
+    Converte um ponto recebido em uma linha da tabela localizacao.
+    Retorna (linha, None) se for válido ou (None, mensagem) caso contrário.
+    """
+    if not isinstance(ponto, dict):
+        return None, "Ponto não é um objeto JSON"
+
+    veiculo_id = ponto.get("veiculo_id")
+    if veiculo_id is None and ponto.get("placa"):
+        veiculo_id = ids_por_placa.get(ponto["placa"])
+        if veiculo_id is None:
+            return None, f"Placa {ponto['placa']} não cadastrada"
+
+    try:
+        veiculo_id = int(veiculo_id)
+        latitude = float(ponto["latitude"])
+        longitude = float(ponto["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None, "Campos obrigatórios: veiculo_id ou placa, latitude, longitude"
+
+    try:
+        timestamp = _converter_timestamp(ponto.get("timestamp"))
+    except (TypeError, ValueError, OverflowError, OSError):
+        # Epoch fora do intervalo suportado levanta OverflowError/OSError
+        return None, "Timestamp inválido: use ISO 8601 ou epoch em segundos"
+
+    if veiculo_id not in ids_validos:
+        return None, f"Veículo {veiculo_id} não cadastrado"
+
+    if not (LAT_MIN <= latitude <= LAT_MAX and LON_MIN <= longitude <= LON_MAX):
+        return None, "Coordenada fora dos limites de Fortaleza"
+
+    return {
+        "veiculo_id": veiculo_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "timestamp": timestamp,
+    }, None
+
+
+def _resolver_veiculos(pontos):
+    """Resolve placas e ids do lote com uma única consulta."""
+    placas = set()
+    ids = set()
+    for ponto in pontos:
+        if not isinstance(ponto, dict):
+            continue
+        if ponto.get("veiculo_id") is not None:
+            try:
+                ids.add(int(ponto["veiculo_id"]))
+            except (TypeError, ValueError):
+                pass
+        elif ponto.get("placa"):
+            placas.add(ponto["placa"])
+
+    if not placas and not ids:
+        return set(), {}
+
+    encontrados = (db.session.query(Veiculo.id, Veiculo.placa)
+                   .filter(db.or_(Veiculo.id.in_(ids), Veiculo.placa.in_(placas)))
+                   .all())
+    return {v.id for v in encontrados}, {v.placa: v.id for v in encontrados}
+
+
+def validar_lote(lote):
+    """
+    Valida um lote de pontos com uma consulta para os veículos.
+    Retorna (linhas válidas, [(posição no lote, mensagem de erro), ...]).
+    """
+    ids_validos, ids_por_placa = _resolver_veiculos(lote)
+    linhas = []
+    erros = []
+    for indice, ponto in enumerate(lote):
+        linha, erro = validar_ponto(ponto, ids_validos, ids_por_placa)
+        if erro:
+            erros.append((indice, erro))
+            continue
+        linhas.append(linha)
+    return linhas, erros
+
+
+def gravar_linhas(linhas):
+    """
+    Grava as linhas na transação corrente: COPY no PostgreSQL e executemany
+    nos demais bancos. Não faz commit.
+    """
+    if not linhas:
+        return
+
+    if db.engine.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        for linha in linhas:
+            buffer.write(f"{linha['veiculo_id']}\t{linha['latitude']}\t"
+                         f"{linha['longitude']}\t{linha['timestamp'].isoformat()}\n")
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(
+            "COPY localizacao (veiculo_id, latitude, longitude, timestamp) FROM STDIN",
+            buffer,
+        )
+        return
+
+    db.session.execute(Localizacao.__table__.insert(), linhas)
+
+
+def inserir_pontos(pontos, tamanho_lote=TAMANHO_LOTE, ultimas=None):
+    """
+    Valida e grava os pontos em lotes, tudo em uma única transação.
+    Retorna as estatísticas da ingestão. Se `ultimas` (dict) for informado,
+    recebe após o commit a linha mais nova gravada de cada veículo.
+    """
+    inicio = time.perf_counter()
+    recebidos = inseridos = lotes = 0
+    erros = []
+    total_erros = 0
+    mais_novas = {}
+
+    pontos = iter(pontos)
+    try:
+        while True:
+            lote = list(islice(pontos, tamanho_lote))
+            if not lote:
+                break
+
+            linhas, erros_lote = validar_lote(lote)
+            for indice, erro in erros_lote:
+                if len(erros) < MAX_ERROS_RELATORIO:
+                    erros.append({"indice": recebidos + indice, "erro": erro})
+            total_erros += len(erros_lote)
+
+            gravar_linhas(linhas)
+            for linha in linhas:
+                atual = mais_novas.get(linha["veiculo_id"])
+                if atual is None or linha["timestamp"] >= atual["timestamp"]:
+                    mais_novas[linha["veiculo_id"]] = linha
+            recebidos += len(lote)
+            inseridos += len(linhas)
+            lotes += 1
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if ultimas is not None:
+        ultimas.update(mais_novas)
+    duracao = time.perf_counter() - inicio
+    return {
+        "recebidos": recebidos,
+        "inseridos": inseridos,
+        "rejeitados": total_erros,
+        "erros": erros,
+        "lotes": lotes,
+        "duracao_s": round(duracao, 4),
+        "pontos_por_segundo": round(inseridos / duracao, 1) if duracao > 0 else None,
+    }
+
+
+class FilaCheia(Exception):
+    """A fila de gravação não tem espaço para os pontos recebidos."""
+
+
+class FilaIngestao:
+    """
+    Fila de gravação assíncrona (write-behind) dos pontos dos rastreadores.
+
+    A requisição só enfileira os pontos e responde; uma thread grava em
+    lotes quando a fila atinge `tamanho_lote` pontos ou quando o ponto mais
+    antigo espera `intervalo` segundos. Acima de `capacidade` pontos
+    pendentes enfileirar() levanta FilaCheia (a rota responde 429). No
+    encerramento do processo o que estiver pendente é gravado (atexit).
+
+    Um lote que falha em todas as tentativas, e o que ainda estiver na fila
+    quando o encerramento estoura o timeout, é derramado em NDJSON em
+    `derramar_dir` (contador "derramados"); para regravar, envie o arquivo
+    para POST /api/localizacoes/batch?sincrono=1 com Content-Type
+    application/x-ndjson. Só o que não pôde nem ser derramado conta como
+    "descartados".
+    """
+
+    def __init__(self, flask_app, capacidade=FILA_CAPACIDADE, tamanho_lote=FILA_LOTE,
+                 intervalo=FILA_INTERVALO, derramar_dir=FILA_DERRAMAR_DIR):
+        self.app = flask_app
+        self.capacidade = capacidade
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.derramar_dir = derramar_dir
+        self._pontos = deque()
+        self._primeiro_em = None
+        self._encerrando = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._ouvintes = []
+        self._contadores = {
+            "enfileirados": 0,
+            "recusados": 0,
+            "gravados": 0,
+            "rejeitados": 0,
+            "derramados": 0,
+            "descartados": 0,
+            "lotes": 0,
+            "falhas": 0,
+        }
+        self._gravacao_total_s = 0.0
+        self._gravacao_max_s = 0.0
+        self._gravacao_ultima_s = None
+
+    def ao_gravar(self, funcao):
+        """Registra uma função chamada com as linhas de cada lote gravado."""
+        self._ouvintes.append(funcao)
+
+    def livre(self):
+        with self._cond:
+            return self.capacidade - len(self._pontos)
+
+    def enfileirar(self, pontos):
+        """
+        Enfileira todos os pontos ou nenhum. Retorna a profundidade da fila.
+        Pontos sem timestamp recebem o horário de chegada, não o da gravação.
+        """
+        recebido_em = datetime.utcnow().isoformat()
+        pontos = [dict(ponto, timestamp=recebido_em)
+                  if isinstance(ponto, dict) and ponto.get("timestamp") in (None, "") else ponto
+                  for ponto in pontos]
+        with self._cond:
+            if self._encerrando or len(self._pontos) + len(pontos) > self.capacidade:
+                self._contadores["recusados"] += len(pontos)
+                raise FilaCheia()
+            if not pontos:
+                return len(self._pontos)
+
+            if not self._pontos:
+                self._primeiro_em = time.monotonic()
+            self._pontos.extend(pontos)
+            self._contadores["enfileirados"] += len(pontos)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="fila-ingestao",
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return len(self._pontos)
+
+    def metricas(self):
+        with self._cond:
+            lotes = self._contadores["lotes"]
+            return dict(
+                self._contadores,
+                profundidade=len(self._pontos),
+                capacidade=self.capacidade,
+                gravacao_ultima_s=self._gravacao_ultima_s,
+                gravacao_media_s=round(self._gravacao_total_s / lotes, 4) if lotes else None,
+                gravacao_max_s=round(self._gravacao_max_s, 4),
+            )
+
+    def encerrar(self, timeout=30.0):
+        """Para de aceitar pontos e espera a gravação do que estiver pendente."""
+        with self._cond:
+            self._encerrando = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+        # Gravação que não terminou a tempo (ou thread que morreu): o restante
+        # não pode sumir com o processo
+        with self._cond:
+            pendentes = list(self._pontos)
+            self._pontos.clear()
+            self._primeiro_em = None
+        if pendentes:
+            print(f"Fila de ingestão não esvaziou em {timeout} s; derramando {len(pendentes)} pontos")
+            self._derramar(pendentes)
+
+    def _proximo_lote(self):
+        """Espera até haver um lote pronto; None quando encerrado e vazio."""
+        with self._cond:
+            while True:
+                if len(self._pontos) >= self.tamanho_lote or (self._encerrando and self._pontos):
+                    break
+                if self._pontos:
+                    restante = self._primeiro_em + self.intervalo - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                elif self._encerrando:
+                    return None
+                else:
+                    self._cond.wait()
+
+            quantidade = min(len(self._pontos), self.tamanho_lote)
+            lote = [self._pontos.popleft() for _ in range(quantidade)]
+            # Os pontos que ficaram chegaram depois do primeiro, mas não se sabe
+            # quando; manter o prazo antigo evita que esperem mais que `intervalo`
+            if not self._pontos:
+                self._primeiro_em = None
+            return lote
+
+    def _executar(self):
+        while True:
+            lote = self._proximo_lote()
+            if lote is None:
+                return
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        for tentativa in range(1, TENTATIVAS_GRAVACAO + 1):
+            inicio = time.perf_counter()
+            with self.app.app_context():
+                try:
+                    linhas, erros = validar_lote(lote)
+                    gravar_linhas(linhas)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Erro ao gravar lote da fila de ingestão (tentativa {tentativa}): {str(e)}")
+                    with self._cond:
+                        self._contadores["falhas"] += 1
+                    if tentativa < TENTATIVAS_GRAVACAO:
+                        time.sleep(min(self.intervalo * tentativa, 5.0))
+                    continue
+                finally:
+                    db.session.remove()
+
+            duracao = time.perf_counter() - inicio
+            with self._cond:
+                self._contadores["gravados"] += len(linhas)
+                self._contadores["rejeitados"] += len(erros)
+                self._contadores["lotes"] += 1
+                self._gravacao_total_s += duracao
+                self._gravacao_max_s = max(self._gravacao_max_s, duracao)
+                self._gravacao_ultima_s = round(duracao, 4)
+
+            if linhas:
+                for funcao in self._ouvintes:
+                    funcao(linhas)
+            return
+
+        self._derramar(lote)
+
+    def _derramar(self, pontos):
+        """Grava os pontos não gravados em um arquivo NDJSON em derramar_dir."""
+        arquivo = os.path.join(self.derramar_dir, "lote-{}-{}.ndjson".format(
+            time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:6]))
+        try:
+            os.makedirs(self.derramar_dir, exist_ok=True)
+            with open(arquivo, "w", encoding="utf-8") as saida:
+                for ponto in pontos:
+                    saida.write(json.dumps(ponto, default=str) + "\n")
+        except Exception as e:
+            print(f"Erro ao derramar {len(pontos)} pontos da fila de ingestão em {arquivo}: {str(e)}")
+            with self._cond:
+                self._contadores["descartados"] += len(pontos)
+            return
+        print(f"{len(pontos)} pontos da fila de ingestão derramados em {arquivo}")
+        with self._cond:
+            self._contadores["derramados"] += len(pontos)
+
+
+fila_ingestao = FilaIngestao(app)
+atexit.register(fila_ingestao.encerrar)
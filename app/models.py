@@ -1,7 +1,10 @@
 from app import db
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import func
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from comum.senhas import gerar_hash, verificar_senha, precisa_rehash
+from comum.json_rapido import data_em_texto
 
 class Veiculo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,7 +13,9 @@ class Veiculo(db.Model):
     cor = db.Column(db.String(50))
     
 
-    localizacoes = db.relationship("Localizacao", backref="veiculo", lazy=True, order_by="Localizacao.timestamp")
+    # Histórico pode ter milhões de pontos: "dynamic" devolve uma query para
+    # filtrar e paginar em vez de carregar tudo ao acessar o atributo
+    localizacoes = db.relationship("Localizacao", backref="veiculo", lazy="dynamic", order_by="Localizacao.timestamp")
 
     def to_dict(self):
         return {
@@ -20,13 +25,24 @@ class Veiculo(db.Model):
             "cor": self.cor
         }
 
+    @classmethod
+    def colunas_json(cls):
+        """Colunas para with_entities que geram as mesmas chaves do to_dict."""
+        return (cls.id, cls.placa, cls.modelo, cls.cor)
+
 
 class Localizacao(db.Model):
+    # Índice composto usado pela busca da última posição de cada veículo
+    __table_args__ = (
+        db.Index("ix_localizacao_veiculo_timestamp", "veiculo_id", "timestamp"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     veiculo_id = db.Column(db.Integer, db.ForeignKey("veiculo.id"), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)  
+    # Chave de partição da tabela no PostgreSQL (ver app/particoes.py)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     def to_dict(self):
         return {
@@ -37,12 +53,62 @@ class Localizacao(db.Model):
             "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S")
         }
 
+    @classmethod
+    def colunas_json(cls):
+        """
+        Colunas para with_entities que geram as mesmas chaves e valores do
+        to_dict, com o timestamp já formatado pelo banco (sem strftime por linha).
+        """
+        return (cls.id, cls.veiculo_id, cls.latitude, cls.longitude,
+                data_em_texto(cls.timestamp, db.engine.dialect.name).label("timestamp"))
+
+    @classmethod
+    def ultimas_por_veiculo(cls, veiculo_ids=None):
+        """
+        Retorna apenas a localização mais recente de cada veículo (ou só dos
+        veículos em veiculo_ids), em ordem de veiculo_id. A consulta parte da
+        tabela veiculo e busca a última posição de cada um com ORDER BY
+        timestamp DESC, id DESC LIMIT 1 pelo índice (veiculo_id, timestamp):
+        uma descida no índice por veículo (por partição, no PostgreSQL), então
+        o custo acompanha o tamanho da frota e não o do histórico. DISTINCT ON
+        e GROUP BY com max() leriam o histórico inteiro de cada veículo.
+        """
+        ultima = db.aliased(cls, name="ultima")
+        filtro = Veiculo.id.in_(veiculo_ids) if veiculo_ids is not None else db.true()
+
+        if db.engine.dialect.name == "postgresql":
+            # LATERAL devolve a linha inteira sem voltar à tabela pelo id
+            # (id sozinho não é chave das partições)
+            recente = (db.select(ultima)
+                       .where(ultima.veiculo_id == Veiculo.id)
+                       .order_by(ultima.timestamp.desc(), ultima.id.desc())
+                       .limit(1)
+                       .subquery("recente")
+                       .lateral())
+            return (db.session.query(db.aliased(cls, recente))
+                    .select_from(Veiculo)
+                    .join(recente, db.true())
+                    .filter(filtro)
+                    .order_by(Veiculo.id)
+                    .all())
+
+        ultimo_id = (db.session.query(ultima.id)
+                     .filter(ultima.veiculo_id == Veiculo.id)
+                     .order_by(ultima.timestamp.desc(), ultima.id.desc())
+                     .limit(1)
+                     .correlate(Veiculo)
+                     .scalar_subquery())
+        return (cls.query
+                .filter(cls.id.in_(db.session.query(ultimo_id).select_from(Veiculo).filter(filtro)))
+                .order_by(cls.veiculo_id)
+                .all())
+
 
 class Usuario(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)  # hashes scrypt passam de 128
 
     def to_dict(self):
         return {
@@ -52,7 +118,10 @@ class Usuario(UserMixin, db.Model):
         }
 
     def set_password(self, senha):
-        self.password_hash = generate_password_hash(senha)
+        self.password_hash = gerar_hash(senha, current_app.config["SENHA_HASH_METODO"])
 
     def check_password(self, senha):
-        return check_password_hash(self.password_hash, senha)
\ No newline at end of file
+        return verificar_senha(self.password_hash, senha)
+
+    def precisa_rehash(self):
+        return precisa_rehash(self.password_hash, current_app.config["SENHA_HASH_METODO"])
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Manutenção das partições mensais da tabela localizacao (PostgreSQL).
+
+A tabela é particionada por faixa de timestamp (migration
+d7a3b5e91c04). Este módulo cria as partições dos próximos meses e aplica a
+retenção desanexando e removendo partições antigas inteiras, em vez de
+DELETEs em massa. Agende no cron, por exemplo uma vez por dia:
+
+    flask --app app particoes criar --meses 3
+    flask --app app particoes reter --meses 12
+"""
+
+from datetime import date
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from app import app, db
+
+
+particoes_cli = AppGroup("particoes", help="Partições mensais de localizacao")
+
+# Partição DEFAULT da migration: recebe timestamps sem partição mensal
+PARTICAO_PADRAO = "localizacao_padrao"
+
+
+def _inicio_do_mes(data, deslocamento=0):
+    total = data.year * 12 + (data.month - 1) + deslocamento
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nome_particao(mes):
+    return f"localizacao_{mes.year:04d}_{mes.month:02d}"
+
+
+def particionada():
+    """True se localizacao é uma tabela particionada neste banco."""
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'localizacao'"
+    )).scalar())
+
+
+def criar_particoes(meses_a_frente=3, hoje=None):
+    """
+    Cria (se não existirem) as partições do mês atual e dos próximos meses.
+    Retorna (criadas, falhas); cada mês é criado na sua própria transação,
+    então uma falha não desfaz os demais.
+    """
+    hoje = hoje or date.today()
+    criadas, falhas = [], []
+    for deslocamento in range(meses_a_frente + 1):
+        mes = _inicio_do_mes(hoje, deslocamento)
+        nome = nome_particao(mes)
+        try:
+            existe = db.session.execute(text("SELECT to_regclass(:nome)"), {"nome": nome}).scalar()
+            if existe:
+                continue
+            _criar_particao(mes, nome)
+            db.session.commit()
+            criadas.append(nome)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao criar a partição {nome}: {str(e)}")
+            falhas.append(nome)
+    return criadas, falhas
+
+
+def _criar_particao(mes, nome):
+    """
+    O PostgreSQL recusa criar a partição de um mês que já tem linhas na
+    partição DEFAULT (pontos gravados antes de a partição existir). Nesse
+    caso a DEFAULT é desanexada, a partição nova é criada, as linhas do mês
+    passam para ela e a DEFAULT volta, tudo na mesma transação. O ATTACH
+    revalida a DEFAULT e bloqueia a tabela até o commit.
+    """
+    faixa = {"inicio": mes, "fim": _inicio_do_mes(mes, 1)}
+    criar = text(
+        f"CREATE TABLE {nome} PARTITION OF localizacao "
+        f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{faixa['fim'].isoformat()}')"
+    )
+    com_linhas_na_padrao = db.session.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {PARTICAO_PADRAO} "
+        'WHERE "timestamp" >= :inicio AND "timestamp" < :fim)'
+    ), faixa).scalar()
+    if not com_linhas_na_padrao:
+        db.session.execute(criar)
+        return
+
+    db.session.execute(text(f"ALTER TABLE localizacao DETACH PARTITION {PARTICAO_PADRAO}"))
+    db.session.execute(criar)
+    db.session.execute(text(
+        f"INSERT INTO {nome} SELECT * FROM {PARTICAO_PADRAO} "
+        'WHERE "timestamp" >= :inicio AND "timestamp" < :fim'
+    ), faixa)
+    db.session.execute(text(
+        f'DELETE FROM {PARTICAO_PADRAO} WHERE "timestamp" >= :inicio AND "timestamp" < :fim'
+    ), faixa)
+    db.session.execute(text(f"ALTER TABLE localizacao ATTACH PARTITION {PARTICAO_PADRAO} DEFAULT"))
+
+
+def aplicar_retencao(meses=12, remover=True, hoje=None):
+    """
+    Desanexa as partições inteiramente anteriores ao limite de retenção e,
+    se remover=True, apaga as tabelas. Com remover=False elas ficam como
+    tabelas comuns, para arquivamento.
+    """
+    limite = _inicio_do_mes(hoje or date.today(), -meses)
+    particoes = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'localizacao' AND c.relname ~ '^localizacao_[0-9]{4}_[0-9]{2}$'"
+    )).scalars().all()
+
+    removidas = []
+    for nome in sorted(particoes):
+        ano, mes = int(nome[-7:-3]), int(nome[-2:])
+        if _inicio_do_mes(date(ano, mes, 1), 1) > limite:
+            continue
+        db.session.execute(text(f"ALTER TABLE localizacao DETACH PARTITION {nome}"))
+        if remover:
+            db.session.execute(text(f"DROP TABLE {nome}"))
+        removidas.append(nome)
+    db.session.commit()
+    return removidas
+
+
+@particoes_cli.command("criar")
+@click.option("--meses", default=3, show_default=True, help="Meses à frente além do atual")
+def comando_criar(meses):
+    """Cria as partições dos próximos meses."""
+    if not particionada():
+        click.echo("localizacao não é particionada neste banco; nada a fazer.")
+        return
+    criadas, falhas = criar_particoes(meses)
+    click.echo(f"Partições criadas: {', '.join(criadas) or 'nenhuma'}")
+    if falhas:
+        raise click.ClickException(f"Partições não criadas: {', '.join(falhas)}")
+
+
+@particoes_cli.command("reter")
+@click.option("--meses", default=12, show_default=True, help="Meses de histórico mantidos")
+@click.option("--apenas-desanexar", is_flag=True, help="Não apaga as partições desanexadas")
+def comando_reter(meses, apenas_desanexar):
+    """Remove as partições mais antigas que a retenção."""
+    if not particionada():
+        click.echo("localizacao não é particionada neste banco; nada a fazer.")
+        return
+    removidas = aplicar_retencao(meses, remover=not apenas_desanexar)
+    acao = "desanexadas" if apenas_desanexar else "removidas"
+    click.echo(f"Partições {acao}: {', '.join(removidas) or 'nenhuma'}")
+
+
+app.cli.add_command(particoes_cli)
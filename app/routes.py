@@ -1,16 +1,27 @@
 from flask_login import login_user, logout_user, login_required, current_user
-from flask import render_template, request, jsonify, redirect, url_for, flash
-from app import app, db
+from flask import render_template, request, jsonify, redirect, url_for, flash, Response
+from app import app, db, metricas, limites
 from app.forms import NomeForm, LoginForm
 from app.models import Veiculo, Localizacao, Usuario
+from app.ingestao import (LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, FilaCheia, fila_ingestao,
+                          ler_pontos, inserir_pontos)
+from app.transmissao import FiltroArea, broker, eventos_iniciais, transmitir
+from app.espacial import indice_posicoes
+from app.trajetos import TOLERANCIA_PADRAO, simplificar, codificar_polyline
+from comum.banco import metricas_pool
+from comum.json_rapido import linhas_como_dicts
+from sqlalchemy import tuple_
+import math
 import random 
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
 
 
 
 
 #index/login
 @app.route("/", methods=["GET", "POST"])
+@limites.por_ip("login", metodos=["POST"])
 def index():
     if current_user.is_authenticated:
         return redirect(url_for("listar_veiculos"))
@@ -21,6 +32,11 @@ def index():
         usuario = Usuario.query.filter_by(email=email).first()
 
         if usuario and usuario.check_password(senha):
+            # Refaz o hash se a política de senhas mudou desde o cadastro
+            if usuario.precisa_rehash():
+                usuario.set_password(senha)
+                db.session.commit()
+
             login_user(usuario)
             flash("Login realizado com sucesso!", "success")
 
@@ -37,6 +53,7 @@ def index():
 
                                             #cadastro de usuario
 @app.route("/form", methods=["GET", "POST"])
+@limites.por_ip("cadastro", metodos=["POST"])
 def form():
     if current_user.is_authenticated:
         return redirect(url_for("index"))
@@ -67,6 +84,15 @@ def form():
 
 
 
+#limite de taxa excedido (Retry-After é adicionado pelo Flask-Limiter)
+@app.errorhandler(429)
+def limite_excedido(erro):
+    if request.path.startswith("/api/"):
+        return jsonify({"message": "Muitas requisições, tente novamente mais tarde"}), 429
+    return "Muitas tentativas em pouco tempo. Aguarde um pouco e tente novamente.", 429
+
+
+
 #Sair da aplicação
 @app.route("/logout")
 @login_required
@@ -87,21 +113,100 @@ def perfil():
 
 
 
+#verificar se o servidor está rodando (e o pool de conexões deste worker)
+@app.route("/health")
+def health():
+    return jsonify({
+        "status": "ok",
+        "pool": metricas_pool(db.engine),
+        "ingestao": fila_ingestao.metricas(),
+    })
+
+
+metricas.coletor(lambda: {f"ingestao_{nome}": valor for nome, valor in fila_ingestao.metricas().items()})
+
+
+
+
+
 #CRUDDEVEÍCULOS
 
+VEICULOS_POR_PAGINA = 50
+LOCALIZACOES_POR_PAGINA = 100
+
+
+def _ler_data(valor, fim_do_dia=False):
+    """
+    Converte 'AAAA-MM-DD' ou 'AAAA-MM-DDTHH:MM' do formulário; vazio vira None.
+    Valor preenchido em outro formato levanta ValueError.
+    """
+    if not valor:
+        return None
+    data = datetime.fromisoformat(valor)
+    if fim_do_dia and len(valor) == 10:
+        data = data.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return data
+
+
+def _coordenadas_validas(latitude, longitude):
+    """Latitude e longitude finitas e dentro dos limites geográficos."""
+    return (math.isfinite(latitude) and math.isfinite(longitude)
+            and -90 <= latitude <= 90 and -180 <= longitude <= 180)
+
+
+def _ler_bbox(valor):
+    """
+    Converte ?bbox=min_lon,min_lat,max_lon,max_lat (ordem do Leaflet).
+    Retorna ((min_lat, min_lon, max_lat, max_lon), None) ou (None, mensagem).
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in valor.split(","))
+    except ValueError:
+        return None, "bbox deve ser min_lon,min_lat,max_lon,max_lat"
+    if not (_coordenadas_validas(min_lat, min_lon) and _coordenadas_validas(max_lat, max_lon)
+            and min_lat <= max_lat and min_lon <= max_lon):
+        return None, ("bbox fora dos limites: longitude entre -180 e 180, "
+                      "latitude entre -90 e 90, mínimos antes dos máximos")
+    return (min_lat, min_lon, max_lat, max_lon), None
+
+
+def _cursor_localizacao(localizacao):
+    """Posição (timestamp, id) de uma linha nos links de paginação."""
+    return f"{localizacao.timestamp.isoformat()}_{localizacao.id}"
+
+
+def _ler_cursor_localizacao(valor):
+    """Inverso de _cursor_localizacao; vazio ou inválido vira None (primeira página)."""
+    if not valor:
+        return None
+    data, _, localizacao_id = valor.rpartition("_")
+    try:
+        return datetime.fromisoformat(data), int(localizacao_id)
+    except ValueError:
+        return None
+
+
 @app.route("/veiculos")
+@limites.por_usuario("leitura")
 @login_required
 def listar_veiculos():
-    veiculos = Veiculo.query.all()
-    return render_template("veiculos.html", title="Lista de Veículos", veiculos=veiculos)
+    pagina = Veiculo.query.order_by(Veiculo.id).paginate(
+        page=request.args.get("page", 1, type=int),
+        per_page=VEICULOS_POR_PAGINA,
+        error_out=False
+    )
 
+    # Última posição dos veículos da página em uma única consulta
+    ids = [v.id for v in pagina.items]
+    ultimas = {loc.veiculo_id: loc for loc in Localizacao.ultimas_por_veiculo(ids)} if ids else {}
 
+    return render_template("veiculos.html", title="Lista de Veículos",
+                           veiculos=pagina.items, pagina=pagina, ultimas=ultimas)
 
-LAT_MIN, LAT_MAX = -3.85, -3.70
-LON_MIN, LON_MAX = -38.60, -38.50
 
 
 @app.route("/veiculo/novo", methods=["GET", "POST"])
+@limites.por_usuario("escrita", metodos=["POST"])
 @login_required
 def novo_veiculo():
     if request.method == "POST":
@@ -116,7 +221,7 @@ def novo_veiculo():
 
         veiculo = Veiculo(placa=placa, modelo=modelo, cor=cor)
         db.session.add(veiculo)
-        db.session.commit()
+        db.session.flush()  # gera o id sem abrir uma segunda transação
 
 
         # Cria localização inicial aleatória
@@ -140,6 +245,7 @@ def novo_veiculo():
 
 
 @app.route("/veiculo/<int:id>/editar", methods=["GET", "POST"])
+@limites.por_usuario("escrita", metodos=["POST"])
 @login_required
 def editar_veiculo(id):
     veiculo = Veiculo.query.get_or_404(id)
@@ -157,6 +263,7 @@ def editar_veiculo(id):
 
 
 @app.route("/veiculo/<int:id>/excluir", methods=["POST"])
+@limites.por_usuario("escrita")
 @login_required
 def excluir_veiculo(id):
     veiculo = Veiculo.query.get_or_404(id)
@@ -177,11 +284,58 @@ def excluir_veiculo(id):
 @login_required
 def listar_localizacoes(veiculo_id):
     veiculo = Veiculo.query.get_or_404(veiculo_id)
-    localizacoes = veiculo.localizacoes
+    try:
+        inicio = _ler_data(request.args.get("inicio"))
+        fim = _ler_data(request.args.get("fim"), fim_do_dia=True)
+    except ValueError:
+        flash("Data inválida: use AAAA-MM-DD ou AAAA-MM-DDTHH:MM.", "danger")
+        return render_template("localizacoes.html",
+                               title=f"Localizações do Veículo {veiculo.placa}",
+                               veiculo=veiculo,
+                               localizacoes=[],
+                               cursor_recentes=None,
+                               cursor_antigas=None,
+                               inicio=request.args.get("inicio", ""),
+                               fim=request.args.get("fim", "")), 400
+
+    # Paginação por cursor em (timestamp, id), mais recentes primeiro: cada
+    # página continua do ponto exato da anterior pelo índice, sem OFFSET e
+    # sem COUNT. ?antes= avança para as mais antigas e ?depois= volta.
+    query = veiculo.localizacoes.order_by(None)
+    if inicio:
+        query = query.filter(Localizacao.timestamp >= inicio)
+    if fim:
+        query = query.filter(Localizacao.timestamp <= fim)
+
+    posicao = tuple_(Localizacao.timestamp, Localizacao.id)
+    antes = _ler_cursor_localizacao(request.args.get("antes"))
+    depois = _ler_cursor_localizacao(request.args.get("depois"))
+    if depois:
+        linhas = (query.filter(posicao > depois)
+                  .order_by(Localizacao.timestamp.asc(), Localizacao.id.asc())
+                  .limit(LOCALIZACOES_POR_PAGINA + 1).all())
+        tem_mais_recentes = len(linhas) > LOCALIZACOES_POR_PAGINA
+        localizacoes = linhas[:LOCALIZACOES_POR_PAGINA][::-1]
+        tem_mais_antigas = True
+    else:
+        if antes:
+            query = query.filter(posicao < antes)
+        linhas = (query.order_by(Localizacao.timestamp.desc(), Localizacao.id.desc())
+                  .limit(LOCALIZACOES_POR_PAGINA + 1).all())
+        tem_mais_antigas = len(linhas) > LOCALIZACOES_POR_PAGINA
+        localizacoes = linhas[:LOCALIZACOES_POR_PAGINA]
+        tem_mais_recentes = antes is not None
+
     return render_template("localizacoes.html",
                            title=f"Localizações do Veículo {veiculo.placa}",
                            veiculo=veiculo,
-                           localizacoes=localizacoes)
+                           localizacoes=localizacoes,
+                           cursor_recentes=_cursor_localizacao(localizacoes[0])
+                           if localizacoes and tem_mais_recentes else None,
+                           cursor_antigas=_cursor_localizacao(localizacoes[-1])
+                           if localizacoes and tem_mais_antigas else None,
+                           inicio=request.args.get("inicio", ""),
+                           fim=request.args.get("fim", ""))
 
 
 
@@ -190,15 +344,193 @@ def listar_localizacoes(veiculo_id):
 
 
                                     #carregar as localizações dos carros
+# ?modo=atual devolve só a última posição de cada veículo (usado pelo mapa);
+# ?bbox=min_lon,min_lat,max_lon,max_lat devolve as posições atuais dentro da
+# área visível, pelo índice em memória; sem parâmetro continua devolvendo o
+# histórico completo.
 @app.route("/api/localizacoes")
 @login_required
 def api_localizacoes():
-    localizacoes = [loc.to_dict() for loc in Localizacao.query.all()]
+    if request.args.get("bbox"):
+        bbox, erro = _ler_bbox(request.args["bbox"])
+        if erro:
+            return jsonify({"message": erro}), 400
+        return jsonify(indice_posicoes.no_retangulo(*bbox))
+
+    if request.args.get("modo") == "atual":
+        localizacoes = [loc.to_dict() for loc in Localizacao.ultimas_por_veiculo()]
+    else:
+        # Histórico pode ter centenas de milhares de linhas: tuplas em vez de objetos do ORM
+        localizacoes = linhas_como_dicts(
+            Localizacao.query.with_entities(*Localizacao.colunas_json()).all())
 
     return jsonify(localizacoes)
 
 
 
+                                    #ingestão em lote dos rastreadores
+# Por padrão os pontos vão para a fila de gravação e a resposta é 202 sem
+# esperar o banco; a validação contra o cadastro acontece na gravação e os
+# rejeitados aparecem nos contadores do /health. Com ?sincrono=1 grava na
+# hora e devolve o relatório de erros por ponto.
+@app.route("/api/localizacoes/batch", methods=["POST"])
+@login_required
+def api_localizacoes_batch():
+    try:
+        pontos = ler_pontos(request)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if request.args.get("sincrono") != "1":
+        # Lê no máximo o que cabe na fila (+1 para detectar que não coube)
+        pontos = list(islice(pontos, max(fila_ingestao.livre(), 0) + 1))
+        try:
+            profundidade = fila_ingestao.enfileirar(pontos)
+        except FilaCheia:
+            resposta = jsonify({"message": "Fila de ingestão cheia, tente novamente"})
+            resposta.headers["Retry-After"] = "1"
+            return resposta, 429
+        return jsonify({"aceitos": len(pontos), "fila": profundidade}), 202
+
+    ultimas = {}
+    estatisticas = inserir_pontos(pontos, ultimas=ultimas)
+    if estatisticas["inseridos"]:
+        _apos_gravar_localizacoes(list(ultimas.values()))
+    status = 201 if estatisticas["inseridos"] else 400
+    return jsonify(estatisticas), status
+
+
+def _apos_gravar_localizacoes(linhas):
+    broker.notificar()
+    indice_posicoes.atualizar(linhas)
+
+
+fila_ingestao.ao_gravar(_apos_gravar_localizacoes)
+
+
+
+                                    #atualizações do mapa em tempo real (SSE)
+# Cada conexão ocupa uma thread do waitress/gunicorn enquanto estiver aberta;
+# dimensione threads de acordo com o número de mapas abertos. Com ?bbox= (mesmo
+# formato de /api/localizacoes) a conexão só recebe os veículos da área, e os
+# que saem dela recebem uma última posição; o mapa reconecta a cada moveend.
+@app.route("/api/localizacoes/stream")
+@login_required
+def api_localizacoes_stream():
+    filtro = None
+    if request.args.get("bbox"):
+        bbox, erro = _ler_bbox(request.args["bbox"])
+        if erro:
+            return jsonify({"message": erro}), 400
+        filtro = FiltroArea(*bbox)
+
+    ultimo_evento_id = request.headers.get("Last-Event-ID", request.args.get("ultimo_id"))
+    try:
+        ultimo_evento_id = int(ultimo_evento_id) if ultimo_evento_id else None
+    except ValueError:
+        ultimo_evento_id = None
+
+    iniciais, maior_id = eventos_iniciais(ultimo_evento_id, filtro)
+    fila = broker.assinar(maior_id, filtro)
+    db.session.close()  # devolve a conexão ao pool antes de manter o stream aberto
+    return Response(transmitir(fila, iniciais), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+
+                                    #veículos mais próximos de um ponto
+@app.route("/api/veiculos/proximos")
+@login_required
+def api_veiculos_proximos():
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        k = int(request.args.get("k", 5))
+    except (KeyError, ValueError):
+        return jsonify({"message": "Informe lat e lon numéricos e k inteiro"}), 400
+    if not _coordenadas_validas(lat, lon):
+        return jsonify({"message": "lat deve estar entre -90 e 90 e lon entre -180 e 180"}), 400
+    k = max(1, min(k, 100))
+
+    proximos = indice_posicoes.mais_proximos(lat, lon, k)
+    veiculos = {v.id: v for v in Veiculo.query.filter(Veiculo.id.in_([p["veiculo_id"] for p in proximos]))}
+    for item in proximos:
+        veiculo = veiculos.get(item["veiculo_id"])
+        item["placa"] = veiculo.placa if veiculo else None
+        item["modelo"] = veiculo.modelo if veiculo else None
+    return jsonify(proximos)
+
+
+
+                                    #trajeto simplificado de um veículo
+# Sem inicio/fim devolve as últimas 24 horas. tolerancia em metros (0 desliga
+# a simplificação); formato=polyline devolve o "encoded polyline" do Google.
+# Lê no máximo max_pontos posições (teto MAX_PONTOS_TRAJETO); além disso o
+# trajeto é cortado e a resposta traz "truncado": true. timestamps=1 inclui
+# o horário de cada ponto mantido.
+MAX_PONTOS_TRAJETO = 100000
+
+
+@app.route("/api/veiculos/<int:id>/trajeto")
+@login_required
+def api_trajeto(id):
+    veiculo = Veiculo.query.get_or_404(id)
+    try:
+        fim = _ler_data(request.args.get("fim"), fim_do_dia=True) or datetime.utcnow()
+        inicio = _ler_data(request.args.get("inicio")) or fim - timedelta(days=1)
+    except ValueError:
+        return jsonify({"message": "inicio e fim devem estar no formato AAAA-MM-DD ou AAAA-MM-DDTHH:MM"}), 400
+    try:
+        tolerancia = float(request.args.get("tolerancia", TOLERANCIA_PADRAO))
+    except ValueError:
+        return jsonify({"message": "tolerancia deve ser numérica"}), 400
+    if not (math.isfinite(tolerancia) and tolerancia >= 0):
+        return jsonify({"message": "tolerancia deve ser um número finito maior ou igual a 0"}), 400
+    try:
+        max_pontos = min(int(request.args.get("max_pontos", MAX_PONTOS_TRAJETO)), MAX_PONTOS_TRAJETO)
+    except ValueError:
+        return jsonify({"message": "max_pontos deve ser inteiro"}), 400
+    if max_pontos < 2:
+        return jsonify({"message": "max_pontos deve ser pelo menos 2"}), 400
+    com_timestamps = request.args.get("timestamps") == "1"
+
+    # Só as colunas necessárias, sem montar objetos do ORM
+    colunas = [Localizacao.latitude, Localizacao.longitude]
+    if com_timestamps:
+        colunas.append(Localizacao.timestamp)
+    linhas = (db.session.query(*colunas)
+              .filter(Localizacao.veiculo_id == veiculo.id,
+                      Localizacao.timestamp >= inicio,
+                      Localizacao.timestamp <= fim)
+              .order_by(Localizacao.timestamp, Localizacao.id)
+              .limit(max_pontos + 1)
+              .all())
+    truncado = len(linhas) > max_pontos
+    linhas = linhas[:max_pontos]
+
+    coordenadas = [(linha[0], linha[1]) for linha in linhas]
+    manter = simplificar(coordenadas, tolerancia) if coordenadas else []
+    mantidas = [linha for linha, ok in zip(linhas, manter) if ok]
+
+    resposta = {
+        "veiculo_id": veiculo.id,
+        "inicio": inicio.strftime("%Y-%m-%d %H:%M:%S"),
+        "fim": fim.strftime("%Y-%m-%d %H:%M:%S"),
+        "tolerancia": tolerancia,
+        "pontos_originais": len(linhas),
+        "pontos": len(mantidas),
+        "truncado": truncado,
+    }
+    if request.args.get("formato") == "polyline":
+        resposta["polyline"] = codificar_polyline([(linha[0], linha[1]) for linha in mantidas])
+    else:
+        resposta["coordenadas"] = [[linha[0], linha[1]] for linha in mantidas]
+    if com_timestamps:
+        resposta["timestamps"] = [linha[2].strftime("%Y-%m-%d %H:%M:%S") for linha in mantidas]
+    return jsonify(resposta)
+
+
+
                                     #carregar o mapa
 @app.route("/mapa")
 @login_required
@@ -211,6 +543,8 @@ def mapa():
 
                                     #carregar o formato json dos carros cadastrados
 @app.route("/api/veiculos", methods=["GET", "POST"])
+@limites.por_usuario("leitura", metodos=["GET"])
+@limites.por_usuario("escrita", metodos=["POST"])
 @login_required
 def api_veiculos():
     if request.method == "POST":
@@ -224,5 +558,5 @@ def api_veiculos():
         db.session.commit()
         return jsonify(veiculo.to_dict()), 201
 
-    veiculos = Veiculo.query.all()
-    return jsonify([v.to_dict() for v in veiculos])
\ No newline at end of file
+    veiculos = Veiculo.query.with_entities(*Veiculo.colunas_json()).all()
+    return jsonify(linhas_como_dicts(veiculos))
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Simulador de frota para teste de carga do subsistema de localizações.
+
+Move N veículos virtuais (placas SIM00001, SIM00002, ...) dentro dos
+limites de Fortaleza, com rumo e velocidade que variam aos poucos, e envia
+uma posição por veículo a cada tick pela mesma fila de gravação usada por
+POST /api/localizacoes/batch. Enquanto roda, mede a latência das consultas
+do mapa (posições atuais e viewport). Exemplo:
+
+    flask --app app simulador --veiculos 10000 --hz 0.5 --duracao 60
+"""
+
+import json
+import math
+import random
+import time
+
+import click
+from flask import jsonify
+
+from app import app, db
+from app.models import Veiculo, Localizacao
+from app.espacial import indice_posicoes
+from app.ingestao import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, FilaCheia, fila_ingestao
+
+
+PREFIXO_PLACA = "SIM"
+
+METROS_POR_GRAU = 111195.0
+
+
+class VeiculoVirtual:
+
+    def __init__(self, veiculo_id, sorteio):
+        self.veiculo_id = veiculo_id
+        self.sorteio = sorteio
+        self.latitude = sorteio.uniform(LAT_MIN, LAT_MAX)
+        self.longitude = sorteio.uniform(LON_MIN, LON_MAX)
+        self.rumo = sorteio.uniform(0, 2 * math.pi)
+        self.velocidade = sorteio.uniform(5.0, 15.0)  # m/s
+
+    def mover(self, segundos):
+        """Avança o veículo; nas bordas da área ele faz a volta."""
+        self.rumo += self.sorteio.gauss(0, 0.3)
+        self.velocidade = min(max(self.velocidade + self.sorteio.gauss(0, 1.0), 0.0), 22.0)
+        distancia = self.velocidade * segundos
+
+        self.latitude += distancia * math.cos(self.rumo) / METROS_POR_GRAU
+        self.longitude += (distancia * math.sin(self.rumo)
+                           / (METROS_POR_GRAU * math.cos(math.radians(self.latitude))))
+
+        if not LAT_MIN <= self.latitude <= LAT_MAX:
+            self.latitude = min(max(self.latitude, LAT_MIN), LAT_MAX)
+            self.rumo = math.pi - self.rumo
+        if not LON_MIN <= self.longitude <= LON_MAX:
+            self.longitude = min(max(self.longitude, LON_MIN), LON_MAX)
+            self.rumo = -self.rumo
+
+    def ponto(self):
+        return {
+            "veiculo_id": self.veiculo_id,
+            "latitude": round(self.latitude, 6),
+            "longitude": round(self.longitude, 6),
+        }
+
+
+def preparar_veiculos(quantidade):
+    """Garante os veículos SIM00001..SIMn no cadastro e devolve seus ids."""
+    placas = [f"{PREFIXO_PLACA}{i:05d}" for i in range(1, quantidade + 1)]
+    existentes = dict(db.session.query(Veiculo.placa, Veiculo.id)
+                      .filter(Veiculo.placa.like(f"{PREFIXO_PLACA}%")))
+    faltantes = [{"placa": placa, "modelo": "Simulado", "cor": None}
+                 for placa in placas if placa not in existentes]
+    if faltantes:
+        db.session.execute(Veiculo.__table__.insert(), faltantes)
+        db.session.commit()
+        existentes = dict(db.session.query(Veiculo.placa, Veiculo.id)
+                          .filter(Veiculo.placa.like(f"{PREFIXO_PLACA}%")))
+    return [existentes[placa] for placa in placas]
+
+
+def _percentis(amostras):
+    if not amostras:
+        return {}
+    ordenadas = sorted(amostras)
+
+    def percentil(p):
+        return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))] * 1000, 2)
+
+    return {"p50_ms": percentil(0.50), "p95_ms": percentil(0.95),
+            "p99_ms": percentil(0.99), "amostras": len(ordenadas)}
+
+
+def _medir_mapa(latencias):
+    """Executa as consultas do mapa como as rotas fazem, incluindo a serialização."""
+    inicio = time.perf_counter()
+    jsonify([loc.to_dict() for loc in Localizacao.ultimas_por_veiculo()])
+    latencias["atual"].append(time.perf_counter() - inicio)
+    db.session.remove()
+
+    centro_lat = random.uniform(LAT_MIN, LAT_MAX)
+    centro_lon = random.uniform(LON_MIN, LON_MAX)
+    inicio = time.perf_counter()
+    jsonify(indice_posicoes.no_retangulo(centro_lat - 0.01, centro_lon - 0.015,
+                                         centro_lat + 0.01, centro_lon + 0.015))
+    latencias["bbox"].append(time.perf_counter() - inicio)
+    db.session.remove()
+
+
+def _processados(metricas):
+    return (metricas["gravados"] + metricas["rejeitados"] + metricas["derramados"]
+            + metricas["descartados"])
+
+
+def simular(veiculos, hz, duracao, intervalo_consulta=1.0, semente=None):
+    """Roda a simulação e devolve o relatório de vazão e latência."""
+    sorteio = random.Random(semente)
+    ids = preparar_veiculos(veiculos)
+    frota = [VeiculoVirtual(veiculo_id, sorteio) for veiculo_id in ids]
+    db.session.remove()
+
+    antes = fila_ingestao.metricas()
+    periodo = 1.0 / hz
+    gerados = aceitos = recusados = ticks = 0
+    latencias = {"atual": [], "bbox": []}
+
+    inicio = time.monotonic()
+    proximo_tick = inicio
+    proxima_consulta = inicio
+    while time.monotonic() - inicio < duracao:
+        agora = time.monotonic()
+        if agora >= proximo_tick:
+            pontos = []
+            for veiculo in frota:
+                veiculo.mover(periodo)
+                pontos.append(veiculo.ponto())
+            gerados += len(pontos)
+            try:
+                fila_ingestao.enfileirar(pontos)
+                aceitos += len(pontos)
+            except FilaCheia:
+                recusados += len(pontos)
+            ticks += 1
+            proximo_tick += periodo
+
+        if agora >= proxima_consulta:
+            _medir_mapa(latencias)
+            proxima_consulta += intervalo_consulta
+
+        time.sleep(max(0.0, min(proximo_tick, proxima_consulta) - time.monotonic()))
+
+    # Espera a fila gravar tudo o que foi aceito (no máximo 60 s) para medir a vazão de ponta a ponta
+    limite = time.monotonic() + 60
+    while _processados(fila_ingestao.metricas()) - _processados(antes) < aceitos \
+            and time.monotonic() < limite:
+        time.sleep(0.05)
+    total_s = time.monotonic() - inicio
+    depois = fila_ingestao.metricas()
+
+    gravados = depois["gravados"] - antes["gravados"]
+    return {
+        "veiculos": veiculos,
+        "hz": hz,
+        "duracao_s": round(total_s, 2),
+        "ticks": ticks,
+        "pontos_gerados": gerados,
+        "pontos_aceitos": aceitos,
+        "pontos_recusados": recusados,
+        "pontos_gravados": gravados,
+        "taxa_alvo_pps": round(veiculos * hz, 1),
+        "gravados_por_segundo": round(gravados / total_s, 1) if total_s else None,
+        "gravacao_media_s": depois["gravacao_media_s"],
+        "gravacao_max_s": depois["gravacao_max_s"],
+        "consulta_atual": _percentis(latencias["atual"]),
+        "consulta_bbox": _percentis(latencias["bbox"]),
+    }
+
+
+@app.cli.command("simulador")
+@click.option("--veiculos", type=click.IntRange(min=1), default=1000, show_default=True,
+              help="Quantidade de veículos virtuais")
+@click.option("--hz", type=click.FloatRange(min=0, min_open=True), default=0.5, show_default=True,
+              help="Posições por segundo de cada veículo")
+@click.option("--duracao", type=click.FloatRange(min=0, min_open=True), default=30.0, show_default=True,
+              help="Segundos de simulação")
+@click.option("--consulta", type=click.FloatRange(min=0, min_open=True), default=1.0, show_default=True,
+              help="Segundos entre medições das consultas do mapa")
+@click.option("--semente", type=int, default=None, help="Semente para repetir os trajetos")
+@click.option("--json", "saida_json", is_flag=True, help="Imprime o relatório em JSON")
+def comando_simulador(veiculos, hz, duracao, consulta, semente, saida_json):
+    """Simula a frota enviando posições pela fila de ingestão."""
+    relatorio = simular(veiculos, hz, duracao, consulta, semente)
+    if saida_json:
+        click.echo(json.dumps(relatorio, indent=2))
+        return
+
+    click.echo(f"{relatorio['veiculos']} veículos a {relatorio['hz']} Hz por {relatorio['duracao_s']} s")
+    click.echo(f"Pontos: {relatorio['pontos_gerados']} gerados, {relatorio['pontos_aceitos']} aceitos, "
+               f"{relatorio['pontos_recusados']} recusados (fila cheia), "
+               f"{relatorio['pontos_gravados']} gravados")
+    click.echo(f"Vazão: alvo {relatorio['taxa_alvo_pps']} pts/s, "
+               f"gravados {relatorio['gravados_por_segundo']} pts/s "
+               f"(lote médio {relatorio['gravacao_media_s']} s, máx {relatorio['gravacao_max_s']} s)")
+    for nome in ("consulta_atual", "consulta_bbox"):
+        click.echo(f"{nome}: {relatorio[nome]}")
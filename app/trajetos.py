@@ -0,0 +1,79 @@
+"""
+Trajeto simplificado de um veículo para desenhar no mapa.
+
+Um dia de posições a cada 2 segundos tem dezenas de milhares de pontos; o
+Ramer–Douglas–Peucker remove os pontos que desviam menos que a tolerância
+(em metros) da reta entre os vizinhos mantidos, preservando o formato.
+"""
+
+import numpy as np
+
+
+# Raio médio da Terra, para projetar lat/lon em metros
+RAIO_TERRA_M = 6371008.8
+
+# Tolerância padrão do RDP, em metros
+TOLERANCIA_PADRAO = 10.0
+
+
+def _projetar(coordenadas):
+    """Projeção equiretangular em torno da latitude média; basta para trechos urbanos."""
+    radianos = np.radians(coordenadas)
+    fator_lon = np.cos(radianos[:, 0].mean())
+    return np.column_stack((radianos[:, 1] * fator_lon, radianos[:, 0])) * RAIO_TERRA_M
+
+
+def simplificar(coordenadas, tolerancia=TOLERANCIA_PADRAO):
+    """
+    Aplica o RDP a uma sequência de (lat, lon) e devolve a máscara booleana
+    dos pontos mantidos. Iterativo (sem recursão) e vetorizado por trecho:
+    a distância de todos os pontos de um trecho à reta é calculada de uma vez.
+    """
+    coordenadas = np.asarray(coordenadas, dtype=np.float64)
+    total = len(coordenadas)
+    manter = np.ones(total, dtype=bool)
+    if total < 3 or tolerancia <= 0:
+        return manter
+
+    xy = _projetar(coordenadas)
+    manter[1:-1] = False
+    pilha = [(0, total - 1)]
+
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+
+        a = xy[inicio]
+        direcao = xy[fim] - a
+        relativo = xy[inicio + 1:fim] - a
+        comprimento = np.hypot(direcao[0], direcao[1])
+        if comprimento == 0.0:
+            distancias = np.hypot(relativo[:, 0], relativo[:, 1])
+        else:
+            distancias = np.abs(direcao[0] * relativo[:, 1] - direcao[1] * relativo[:, 0]) / comprimento
+
+        indice = int(np.argmax(distancias))
+        if distancias[indice] > tolerancia:
+            indice += inicio + 1
+            manter[indice] = True
+            pilha.append((inicio, indice))
+            pilha.append((indice, fim))
+
+    return manter
+
+
+def codificar_polyline(coordenadas, precisao=5):
+    """Codifica (lat, lon) no formato "encoded polyline" do Google."""
+    coordenadas = np.asarray(coordenadas, dtype=np.float64).reshape(-1, 2)
+    valores = np.round(coordenadas * 10 ** precisao).astype(np.int64)
+    deltas = np.diff(valores, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    deltas = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    partes = []
+    for valor in deltas.tolist():
+        while valor >= 0x20:
+            partes.append(chr((0x20 | (valor & 0x1F)) + 63))
+            valor >>= 5
+        partes.append(chr(valor + 63))
+    return "".join(partes)
@@ -0,0 +1,316 @@
+import queue
+import threading
+import time
+
+from app import app, db
+from app.espacial import indice_posicoes
+from app.models import Localizacao
+from comum.json_rapido import dumps_compacto
+
+
+# Intervalo máximo entre duas leituras do banco enquanto houver assinantes
+INTERVALO_LEITURA = 2.0
+
+# Linhas lidas por ciclo do broker
+LIMITE_LEITURA = 5000
+
+# Ao retomar com Last-Event-ID, acima disso envia o snapshot em vez do atraso
+LIMITE_RETOMADA = 5000
+
+# Eventos pendentes por conexão antes de derrubar um cliente lento
+TAMANHO_FILA_CLIENTE = 100
+
+# Comentário de keep-alive para proxies não fecharem a conexão
+INTERVALO_KEEPALIVE = 15.0
+
+# Transações concorrentes (lotes, COPY, fila de gravação) podem confirmar ids
+# menores depois que um id maior já ficou visível. Os ids pulados continuam
+# sendo procurados por este tempo, em segundos
+PRAZO_LACUNA = 30.0
+
+# Intervalos de ids pulados acompanhados ao mesmo tempo; os mais antigos saem primeiro
+MAX_LACUNAS = 200
+
+
+def formatar_evento(localizacoes, evento="posicoes", ultimo_id=None):
+    """Monta um evento SSE; o id é o maior id de localização lido (ou ultimo_id)."""
+    if ultimo_id is None:
+        ultimo_id = max((loc["id"] for loc in localizacoes), default=0)
+    dados = dumps_compacto(localizacoes)
+    return f"id: {ultimo_id}\nevent: {evento}\ndata: {dados}\n\n"
+
+
+def _mais_recentes(localizacoes):
+    """Mantém só a posição mais nova de cada veículo dentro de um lote."""
+    por_veiculo = {}
+    for loc in localizacoes:
+        por_veiculo[loc.veiculo_id] = loc
+    return [loc.to_dict() for loc in por_veiculo.values()]
+
+
+class FiltroArea:
+    """
+    Área visível de uma conexão (?bbox=). Passam as posições dentro da área
+    e, uma última vez, a de um veículo que já foi enviado e saiu dela, para
+    o mapa não deixar o marcador parado na borda.
+    """
+
+    def __init__(self, min_lat, min_lon, max_lat, max_lon):
+        self.min_lat = min_lat
+        self.min_lon = min_lon
+        self.max_lat = max_lat
+        self.max_lon = max_lon
+        self._visiveis = set()
+
+    def selecionar(self, posicoes):
+        selecionadas = []
+        for loc in posicoes:
+            dentro = (self.min_lat <= loc["latitude"] <= self.max_lat
+                      and self.min_lon <= loc["longitude"] <= self.max_lon)
+            if dentro:
+                self._visiveis.add(loc["veiculo_id"])
+            elif loc["veiculo_id"] in self._visiveis:
+                self._visiveis.discard(loc["veiculo_id"])
+            else:
+                continue
+            selecionadas.append(loc)
+        return selecionadas
+
+
+def _esvaziar(fila):
+    while True:
+        try:
+            fila.get_nowait()
+        except queue.Empty:
+            return
+
+
+class BrokerLocalizacoes:
+    """
+    Distribui as novas localizações para todas as conexões SSE abertas.
+
+    Uma única thread lê do banco as linhas com id maior que o último visto
+    e entrega o mesmo evento para todos os assinantes, então N abas abertas
+    custam uma leitura por ciclo; conexões com FiltroArea recebem só a
+    parte do evento que cabe na sua área. A thread só existe enquanto houver
+    assinantes e pode ser acordada antes do intervalo por notificar().
+
+    Ids pulados entre duas leituras (transação que ainda não confirmou)
+    são relidos por PRAZO_LACUNA segundos. Como essas linhas chegam fora
+    de ordem, só é publicada a posição mais nova que a última já enviada
+    de cada veículo.
+    """
+
+    def __init__(self, flask_app, intervalo=INTERVALO_LEITURA):
+        self.app = flask_app
+        self.intervalo = intervalo
+        self.ultimo_id = None
+        self._lacunas = []  # [inicio, fim, prazo] de ids ainda não vistos
+        self._enviadas = {}  # veiculo_id -> (timestamp, id) da última posição publicada
+        self._assinantes = {}  # fila -> FiltroArea ou None
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def assinar(self, ultimo_id, filtro=None):
+        """
+        Registra uma conexão que já recebeu as localizações até ultimo_id.
+        Chamado dentro de um request (pode consultar o banco).
+        """
+        fila = queue.Queue(maxsize=TAMANHO_FILA_CLIENTE)
+        with self._lock:
+            if self.ultimo_id is None:
+                self.ultimo_id = ultimo_id
+            elif self.ultimo_id > ultimo_id:
+                # O broker já passou do ponto em que o snapshot da conexão parou;
+                # entrega o intervalo antes de qualquer publicação (sob o lock)
+                evento = self._intervalo_perdido(ultimo_id, self.ultimo_id, filtro)
+                if evento:
+                    fila.put_nowait(evento)
+            self._assinantes[fila] = filtro
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="broker-localizacoes",
+                                                daemon=True)
+                self._thread.start()
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.pop(fila, None)
+
+    def notificar(self):
+        """Chamado após gravar novas localizações para publicar sem esperar o intervalo."""
+        self._acordar.set()
+
+    def publicar(self, posicoes, ultimo_id):
+        with self._lock:
+            assinantes = list(self._assinantes.items())
+
+        completo = None
+        for fila, filtro in assinantes:
+            if filtro is None:
+                if completo is None:
+                    completo = formatar_evento(posicoes, ultimo_id=ultimo_id)
+                evento = completo
+            else:
+                selecionadas = filtro.selecionar(posicoes)
+                if not selecionadas:
+                    continue
+                evento = formatar_evento(selecionadas, ultimo_id=ultimo_id)
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                # Cliente lento: desconecta; o navegador reconecta com Last-Event-ID
+                self.cancelar(fila)
+                _esvaziar(fila)
+                fila.put_nowait(None)
+
+    def _intervalo_perdido(self, desde, ate, filtro=None):
+        atrasadas = (Localizacao.query
+                     .filter(Localizacao.id > desde, Localizacao.id <= ate)
+                     .order_by(Localizacao.id)
+                     .limit(LIMITE_RETOMADA + 1)
+                     .all())
+        if len(atrasadas) > LIMITE_RETOMADA:
+            atrasadas = Localizacao.ultimas_por_veiculo()
+        posicoes = _mais_recentes(atrasadas)
+        if filtro is not None:
+            posicoes = filtro.selecionar(posicoes)
+        if not posicoes:
+            return None
+        return formatar_evento(posicoes, ultimo_id=ate)
+
+    def _executar(self):
+        while True:
+            with self._lock:
+                if not self._assinantes:
+                    self._thread = None
+                    self.ultimo_id = None
+                    self._lacunas = []
+                    self._enviadas = {}
+                    return
+
+            try:
+                self._ler_novas()
+            except Exception as e:
+                print(f"Erro no broker de localizações: {str(e)}")
+
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def _ler_novas(self):
+        agora = time.monotonic()
+        self._lacunas = [lacuna for lacuna in self._lacunas if lacuna[2] > agora][-MAX_LACUNAS:]
+
+        with self.app.app_context():
+            try:
+                novas = (Localizacao.query
+                         .filter(Localizacao.id > self.ultimo_id)
+                         .order_by(Localizacao.id)
+                         .limit(LIMITE_LEITURA)
+                         .all())
+                atrasadas = []
+                if self._lacunas:
+                    atrasadas = (Localizacao.query
+                                 .filter(db.or_(*(Localizacao.id.between(inicio, fim)
+                                                  for inicio, fim, _ in self._lacunas)))
+                                 .order_by(Localizacao.id)
+                                 .limit(LIMITE_LEITURA)
+                                 .all())
+            finally:
+                db.session.remove()
+
+        self._preencher_lacunas([loc.id for loc in atrasadas])
+        anterior = self.ultimo_id
+        for loc in novas:
+            if loc.id > anterior + 1:
+                self._lacunas.append([anterior + 1, loc.id - 1, agora + PRAZO_LACUNA])
+            anterior = loc.id
+
+        posicoes = self._mais_novas_que_enviadas(atrasadas + novas)
+        with self._lock:
+            # Sob o lock: quem assinar depois disto recupera o intervalo em assinar()
+            self.ultimo_id = anterior
+        if posicoes:
+            self.publicar(posicoes, anterior)
+
+    def _preencher_lacunas(self, encontrados):
+        """Tira das lacunas os ids que apareceram, dividindo os intervalos."""
+        for id_encontrado in encontrados:
+            for indice, (inicio, fim, prazo) in enumerate(self._lacunas):
+                if inicio <= id_encontrado <= fim:
+                    pedacos = [[a, b, prazo] for a, b in ((inicio, id_encontrado - 1),
+                                                          (id_encontrado + 1, fim)) if a <= b]
+                    self._lacunas[indice:indice + 1] = pedacos
+                    break
+
+    def _mais_novas_que_enviadas(self, localizacoes):
+        """Posição mais nova de cada veículo, se for mais nova que a já publicada."""
+        por_veiculo = {}
+        for loc in localizacoes:
+            atual = por_veiculo.get(loc.veiculo_id)
+            if atual is None or (loc.timestamp, loc.id) > (atual.timestamp, atual.id):
+                por_veiculo[loc.veiculo_id] = loc
+
+        posicoes = []
+        for veiculo_id, loc in por_veiculo.items():
+            chave = (loc.timestamp, loc.id)
+            enviada = self._enviadas.get(veiculo_id)
+            if enviada is None or chave > enviada:
+                self._enviadas[veiculo_id] = chave
+                posicoes.append(loc.to_dict())
+        return posicoes
+
+
+def eventos_iniciais(ultimo_evento_id, filtro=None):
+    """
+    Eventos enviados ao conectar: o atraso desde Last-Event-ID, quando o
+    cliente está retomando e o atraso é pequeno, ou o snapshot das posições
+    atuais caso contrário. Com filtro, o snapshot vem do índice espacial
+    (gravações de outros processos aparecem em até TTL_INDICE segundos) e
+    só cobre a área. Retorna (eventos, maior id já coberto).
+    """
+    maior_id = db.session.query(db.func.max(Localizacao.id)).scalar() or 0
+
+    if ultimo_evento_id is not None:
+        atrasadas = (Localizacao.query
+                     .filter(Localizacao.id > ultimo_evento_id)
+                     .order_by(Localizacao.id)
+                     .limit(LIMITE_RETOMADA + 1)
+                     .all())
+        if len(atrasadas) <= LIMITE_RETOMADA:
+            posicoes = _mais_recentes(atrasadas)
+            if filtro is not None:
+                posicoes = filtro.selecionar(posicoes)
+            eventos = [formatar_evento(posicoes)] if posicoes else []
+            return eventos, maior_id
+
+    if filtro is None:
+        atuais = [loc.to_dict() for loc in Localizacao.ultimas_por_veiculo()]
+    else:
+        atuais = filtro.selecionar(indice_posicoes.no_retangulo(
+            filtro.min_lat, filtro.min_lon, filtro.max_lat, filtro.max_lon))
+    return [formatar_evento(atuais, ultimo_id=maior_id)], maior_id
+
+
+def transmitir(fila, iniciais):
+    """Gerador da resposta text/event-stream de uma conexão."""
+    try:
+        for evento in iniciais:
+            yield evento
+
+        while True:
+            try:
+                evento = fila.get(timeout=INTERVALO_KEEPALIVE)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+
+            if evento is None:
+                return
+            yield evento
+    finally:
+        broker.cancelar(fila)
+
+
+broker = BrokerLocalizacoes(app)
@@ -1,13 +1,39 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt, decode_token
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import timedelta
+from datetime import datetime, timedelta
 from sqlalchemy import func # Adicionada para a função SUM e COUNT no Dashboard
+from sqlalchemy import tuple_, case, type_coerce, event, inspect, literal_column
+from sqlalchemy.orm import Session, object_session
+from itertools import islice
+import base64
+import json
 import os
+import sys
 from dotenv import load_dotenv
 
+# Módulos do backend (estatisticas, busca, cache...) e o pacote comum/ (compartilhado
+# com o app de rastreamento, na raiz do repositório), de qualquer diretório de trabalho
+DIRETORIO_BACKEND = os.path.dirname(os.path.abspath(__file__))
+for _caminho in (DIRETORIO_BACKEND, os.path.dirname(DIRETORIO_BACKEND)):
+    if _caminho not in sys.path:
+        sys.path.append(_caminho)
+
+from estatisticas import EstatisticasDashboard
+from busca import BuscaCarros
+from cache import VersaoTabela, criar_cache, resposta_em_cache
+from transferencia import (COLUNAS_EXPORTACAO, TIPOS_NDJSON, converter_registro,
+                           gerar_csv, gerar_ndjson, ler_registros)
+from comum.banco import opcoes_engine, metricas_pool
+from comum.senhas import METODO_PADRAO, gerar_hash, verificar_senha, precisa_rehash
+from comum.identidade import CacheIdentidade
+from comum.metricas import Metricas
+from comum.orcamento_sql import OrcamentoConsultas
+from comum.perfilador import PerfiladorAmostragem
+from comum.limites import DescarteCarga, Limites
+from comum.json_rapido import instalar as instalar_json_rapido
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -16,12 +42,64 @@ app = Flask(__name__)
 # CONFIGURACOES
 # =====================
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///usuarios.db')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'chave-muito-secreta')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600)))
+# Algoritmo e custo do hash de senhas (ver comum/senhas.py)
+app.config['SENHA_HASH_METODO'] = os.getenv('SENHA_HASH_METODO', METODO_PADRAO)
+# Inclui nome/email no token para o /api/perfil responder sem ir ao banco
+app.config['JWT_PERFIL_NO_TOKEN'] = os.getenv('JWT_PERFIL_NO_TOKEN', 'False').lower() == 'true'
 
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
 
+# jsonify com orjson quando instalado (ver comum/json_rapido.py)
+instalar_json_rapido(app)
+
+# Agregados do dashboard mantidos em memória (ver estatisticas.py)
+estatisticas_dashboard = EstatisticasDashboard(ttl=int(os.getenv('DASHBOARD_CACHE_TTL', 60)))
+
+# Busca textual de /api/carros?q= (ver busca.py)
+busca_carros = BuscaCarros(db)
+
+# Cache de respostas com ETag das leituras de carros (ver cache.py)
+cliente_redis, cache_respostas = criar_cache(
+    os.getenv('REDIS_URL'),
+    max_itens=int(os.getenv('RESPOSTAS_CACHE_MAX_ITENS', 512)),
+    ttl=int(os.getenv('RESPOSTAS_CACHE_TTL', 300))
+)
+versao_carros = VersaoTabela('carros', cliente_redis)
+
+# Latência, status e SQL por endpoint em /metrics (ver comum/metricas.py)
+metricas = Metricas(app, db, prefixo='backend')
+metricas.coletor(lambda: {f'pool_{nome}': valor for nome, valor in metricas_pool(db.engine).items()})
+
+# Limite de consultas por request em desenvolvimento/testes; desligado sem SQL_ORCAMENTO (ver comum/orcamento_sql.py)
+orcamento_sql = OrcamentoConsultas(app, db)
+
+# Perfil por amostragem sob demanda (X-Perfilar) ou por taxa; desligado por padrão (ver comum/perfilador.py)
+app.wsgi_app = PerfiladorAmostragem(app.wsgi_app, nome='backend')
+
+# Teto de requisições simultâneas, com um teto separado para login/cadastro (ver comum/limites.py)
+descarte_carga = DescarteCarga(app, autenticacao={'login', 'cadastro'})
+metricas.coletor(descarte_carga.metricas)
+
+
+def usuario_do_token():
+    """Id do usuário do JWT no cabeçalho, sem ir ao banco; chave dos limites por usuário."""
+    cabecalho = request.headers.get('Authorization', '')
+    if not cabecalho.startswith('Bearer '):
+        return None
+    try:
+        return decode_token(cabecalho[7:])['sub']
+    except Exception:
+        # Token inválido conta pelo IP; o jwt_required da rota responde 401
+        return None
+
+
+# Limites de taxa por IP (login/cadastro) e por usuário (rotas de carros)
+limites = Limites(app, chave_usuario=usuario_do_token, prefixo='backend')
+
 # ✅ Configuração única e correta de CORS
 CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
 
@@ -42,6 +120,11 @@ def missing_token_callback(error):
 def expired_token_callback(jwt_header, jwt_data):
     return jsonify({'message': 'Token expirado'}), 401
 
+# Limite de taxa excedido (Retry-After e X-RateLimit-* são adicionados pelo Flask-Limiter)
+@app.errorhandler(429)
+def limite_excedido_callback(error):
+    return jsonify({'message': 'Muitas requisicoes, tente novamente mais tarde'}), 429
+
 # =====================
 # MODELS
 # =====================
@@ -59,10 +142,13 @@ class Usuario(db.Model):
     carros = db.relationship('Carro', backref='usuario', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, senha):
-        self.senha = generate_password_hash(senha)
+        self.senha = gerar_hash(senha, app.config['SENHA_HASH_METODO'])
 
     def check_password(self, senha):
-        return check_password_hash(self.senha, senha)
+        return verificar_senha(self.senha, senha)
+
+    def precisa_rehash(self):
+        return precisa_rehash(self.senha, app.config['SENHA_HASH_METODO'])
 
     def to_dict(self):
         return {
@@ -73,12 +159,35 @@ class Usuario(db.Model):
         }
 
 
+# Usuário dos tokens sem o perfil embutido, em cache (ver comum/identidade.py).
+# Não há user_lookup_loader: as rotas que precisam do usuário o carregam, as
+# demais só usam o id do token.
+cache_identidade = CacheIdentidade(
+    ttl=int(os.getenv('IDENTIDADE_CACHE_TTL', 60)),
+    max_itens=int(os.getenv('IDENTIDADE_CACHE_MAX', 1024)),
+    colunas_sensiveis=('senha',)
+)
+cache_identidade.monitorar(Usuario)
+
+
 # =====================
 # NOVO MODEL: CARROS
 # =====================
 
 class Carro(db.Model):
     __tablename__ = 'carros'
+    __table_args__ = (
+        # Suporta a paginação por cursor em (data_criacao, id)
+        db.Index('ix_carros_data_criacao_id', 'data_criacao', 'id'),
+        # Filtros por faixa de preço/ano da listagem (quase sempre com ativo)
+        db.Index('ix_carros_ativo_preco', 'ativo', 'preco'),
+        db.Index('ix_carros_ativo_ano', 'ativo', 'ano'),
+        # Carros de um usuário, mais recentes primeiro
+        db.Index('ix_carros_usuario_data_criacao', 'usuario_id', 'data_criacao'),
+        # Ordenações de ?sort= com o filtro ativo, na ordem do cursor
+        db.Index('ix_carros_ativo_data_criacao_id', 'ativo', 'data_criacao', 'id'),
+        db.Index('ix_carros_ativo_marca_id', 'ativo', 'marca', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     marca = db.Column(db.String(120), nullable=False)
@@ -113,12 +222,237 @@ class Carro(db.Model):
             'usuario_id': self.usuario_id
         }
 
+# Índice de expressão para sort=km_*: o ORDER BY precisa usar exatamente a
+# mesma expressão (com o 0 literal, não um parâmetro) para o banco aproveitá-lo
+KM_ORDENACAO = func.coalesce(Carro.quilometragem, literal_column('0'))
+db.Index('ix_carros_ativo_km_id', Carro.ativo, KM_ORDENACAO, Carro.id)
+
+# =====================
+# VERSAO DA TABELA DE CARROS
+# =====================
+
+# Marca a sessão quando um Carro é gravado e só incrementa a versão depois
+# do commit; incrementar no flush deixaria outra requisição guardar no
+# cache dados antigos com a versão nova.
+@event.listens_for(Carro, 'after_insert')
+@event.listens_for(Carro, 'after_update')
+@event.listens_for(Carro, 'after_delete')
+def marcar_carros_alterados(mapper, connection, carro):
+    object_session(carro).info['carros_alterados'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def incrementar_versao_carros(session):
+    if session.info.pop('carros_alterados', False):
+        versao_carros.incrementar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def descartar_alteracoes_carros(session):
+    session.info.pop('carros_alterados', None)
+
+
+# =====================
+# PAGINACAO E PROJECAO DE CARROS
+# =====================
+
+LIMITE_PADRAO_CARROS = 50
+LIMITE_MAXIMO_CARROS = 500
+
+# Campos que podem ser pedidos em ?fields= (mesmas chaves de Carro.to_dict)
+CAMPOS_CARRO = ('id', 'marca', 'modelo', 'ano', 'preco', 'cor', 'quilometragem',
+                'combustivel', 'cambio', 'descricao', 'imagem_url', 'ativo',
+                'data_criacao', 'usuario_id')
+
+
+# Valores aceitos em ?sort=: (expressão, decrescente). O id entra como
+# desempate na mesma direção, formando a chave do cursor.
+ORDENACOES = {
+    'recentes': (Carro.data_criacao, True),
+    'preco_asc': (Carro.preco, False),
+    'preco_desc': (Carro.preco, True),
+    'ano_asc': (Carro.ano, False),
+    'ano_desc': (Carro.ano, True),
+    'km_asc': (KM_ORDENACAO, False),
+    'km_desc': (KM_ORDENACAO, True),
+    'marca_asc': (Carro.marca, False),
+    'marca_desc': (Carro.marca, True),
+}
+
+
+def codificar_cursor(ordenacao, valor, carro_id):
+    """Cursor opaco com a ordenação e a posição do último item da página."""
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    dados = json.dumps([ordenacao, valor, carro_id])
+    return base64.urlsafe_b64encode(dados.encode()).decode()
+
+
+# Chaves de ordenação que aceitam NULL (data_criacao tem default, mas a coluna
+# não é NOT NULL)
+ORDENACOES_NULAVEIS = {'recentes'}
+
+
+def expressao_do_cursor(ordenacao, expressao):
+    """Expressão usada no ORDER BY e na comparação do cursor."""
+    if ordenacao == 'recentes' and db.engine.dialect.name == 'sqlite':
+        # O SQLite guarda datas como texto em formatos diferentes (now() não
+        # tem microssegundos); o cursor compara o texto cru, igual ao ORDER BY
+        return type_coerce(Carro.data_criacao, db.String)
+    return expressao
+
+
+def nulos_no_inicio(descendente):
+    """
+    Se os NULL vêm antes dos valores na ordem da listagem. A ordem nativa do
+    banco é mantida (sem NULLS FIRST/LAST) para o ORDER BY seguir os índices:
+    NULL é o maior valor no PostgreSQL e o menor no SQLite e no MySQL.
+    """
+    nulo_maior = db.engine.dialect.name not in ('sqlite', 'mysql', 'mariadb')
+    return descendente == nulo_maior
+
+
+def filtro_apos_cursor(expressao, descendente, nulavel, posicao):
+    """
+    Linhas depois da posição (valor, id) do cursor. A comparação de tupla
+    nunca encontra linhas com a chave NULL, então as chaves que aceitam NULL
+    tratam o bloco de NULL (desempatado pelo id) à parte.
+    """
+    valor, carro_id = posicao
+    if descendente:
+        comparacao, depois_do_id = tuple_(expressao, Carro.id) < posicao, Carro.id < carro_id
+    else:
+        comparacao, depois_do_id = tuple_(expressao, Carro.id) > posicao, Carro.id > carro_id
+    if not nulavel:
+        return comparacao
+
+    no_bloco_nulo = db.and_(expressao.is_(None), depois_do_id)
+    if nulos_no_inicio(descendente):
+        if valor is None:
+            return db.or_(no_bloco_nulo, expressao.isnot(None))
+        return comparacao
+    if valor is None:
+        return no_bloco_nulo
+    return db.or_(comparacao, expressao.is_(None))
+
+
+def decodificar_cursor(cursor, ordenacao):
+    nome, valor, carro_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if nome != ordenacao:
+        raise ValueError('cursor gerado para outra ordenação')
+    if ordenacao == 'recentes' and valor is not None and db.engine.dialect.name != 'sqlite':
+        valor = datetime.fromisoformat(valor)
+    return valor, int(carro_id)
+
+
+def ler_numero(nome, tipo):
+    """Lê um parâmetro numérico opcional; valor inválido gera ValueError."""
+    valor = request.args.get(nome)
+    if valor is None or valor == '':
+        return None
+    return tipo(valor)
+
+
+def campos_solicitados(fields):
+    """Lê ?fields=a,b,c; sem o parâmetro retorna todos os campos."""
+    if not fields:
+        return list(CAMPOS_CARRO)
+
+    campos = [c.strip() for c in fields.split(',') if c.strip()]
+    invalidos = [c for c in campos if c not in CAMPOS_CARRO]
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {', '.join(invalidos)}")
+    return campos
+
+
+def serializar_linhas(linhas, campos):
+    """
+    Converte linhas de with_entities no mesmo formato de Carro.to_dict. Os
+    campos pedidos são as primeiras colunas da linha, então cada item sai
+    de um zip; depois só preco e data_criacao são convertidos, coluna a coluna.
+    """
+    campos = list(dict.fromkeys(campos))
+    itens = [dict(zip(campos, linha)) for linha in linhas]
+
+    if 'preco' in campos:
+        for item in itens:
+            valor = item['preco']
+            if valor is not None and type(valor) is not float:
+                item['preco'] = float(valor)
+    if 'data_criacao' in campos:
+        for item in itens:
+            valor = item['data_criacao']
+            item['data_criacao'] = valor.isoformat() if valor else None
+    return itens
+
+
+def estimar_total(query):
+    """
+    Total aproximado para a listagem. No PostgreSQL usa a estimativa do
+    planejador (EXPLAIN), que não varre a tabela; nos demais bancos faz o
+    count() normal.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return query.order_by(None).count()
+
+    compilado = query.order_by(None).statement.compile(dialect=db.engine.dialect)
+    plano = db.session.connection().exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {compilado}', compilado.params
+    ).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+def garantir_indices():
+    """
+    Cria os índices declarados nos models que ainda não existem no banco.
+    O db.create_all() só cria índices junto com tabelas novas, então bancos
+    já existentes (ex: instance/usuarios.db) precisam deste passo.
+    """
+    existentes = nomes_dos_indices()
+    for tabela in db.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            if indice.name not in existentes:
+                indice.create(bind=db.engine)
+
+
+@app.cli.command('preparar-banco')
+def preparar_banco():
+    """Cria tabelas, índices e os objetos da busca textual (deploy via WSGI)."""
+    db.create_all()
+    garantir_indices()
+    busca_carros.preparar()
+    print(f'Banco preparado (busca: {busca_carros.modo})')
+
+
+def nomes_dos_indices():
+    """
+    Nomes dos índices do banco. A reflexão do SQLAlchemy ignora índices de
+    expressão (ex: ix_carros_ativo_km_id), então SQLite e PostgreSQL são
+    consultados direto no catálogo.
+    """
+    dialeto = db.engine.dialect.name
+    with db.engine.connect() as conexao:
+        if dialeto == 'sqlite':
+            resultado = conexao.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+        elif dialeto == 'postgresql':
+            resultado = conexao.exec_driver_sql(
+                'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()')
+        else:
+            inspetor = inspect(conexao)
+            return {indice['name'] for tabela in db.metadata.sorted_tables
+                    for indice in inspetor.get_indexes(tabela.name)}
+        return {nome for (nome,) in resultado}
+
+
 # =====================
 # ROTAS DE AUTENTICACAO
 # =====================
 
 
 @app.route('/login', methods=['POST'])
+@limites.por_ip('login')
 def login():
     """
     Endpoint para login do usuario.
@@ -133,9 +467,18 @@ def login():
         
         if not usuario or not usuario.check_password(dados['senha']):
             return jsonify({'message': 'Email ou senha incorretos.'}), 401
+
+        # Refaz o hash se a política de senhas mudou desde o cadastro
+        if usuario.precisa_rehash():
+            usuario.set_password(dados['senha'])
+            db.session.commit()
         
         # Gerar JWT token
-        access_token = create_access_token(identity=str(usuario.id))
+        claims = {}
+        if app.config['JWT_PERFIL_NO_TOKEN']:
+            # Só dados não sensíveis; o token continua válido até expirar mesmo se o perfil mudar
+            claims = {'perfil': usuario.to_dict()}
+        access_token = create_access_token(identity=str(usuario.id), additional_claims=claims)
         
         return jsonify({
             'access_token': access_token,
@@ -148,6 +491,7 @@ def login():
 
 
 @app.route('/form', methods=['POST'])
+@limites.por_ip('cadastro')
 def cadastro():
     """
     Endpoint para cadastro de novo usuario.
@@ -189,14 +533,17 @@ def cadastro():
 def obter_perfil():
     """
     Endpoint protegido para obter dados do perfil do usuario logado.
+    Usa o perfil embutido no token quando existir; senão o usuário vem do
+    cache de identidade.
     """
     try:
-        usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(int(usuario_id))
-        
+        perfil = get_jwt().get('perfil')
+        if perfil:
+            return jsonify(perfil), 200
+
+        usuario = cache_identidade.carregar(db, Usuario, int(get_jwt_identity()))
         if not usuario:
             return jsonify({'message': 'Usuario nao encontrado'}), 404
-        
         return jsonify(usuario.to_dict()), 200
     
     except Exception as e:
@@ -213,7 +560,11 @@ def obter_perfil():
 @app.route('/health', methods=['GET'])
 def health():
     """Endpoint para verificar se o servidor esta rodando"""
-    return jsonify({'status': 'ok', 'message': 'Backend Flask rodando'}), 200
+    return jsonify({
+        'status': 'ok',
+        'message': 'Backend Flask rodando',
+        'pool': metricas_pool(db.engine)
+    }), 200
 
 
 # =====================
@@ -221,12 +572,44 @@ def health():
 # =====================
 
 @app.route('/api/carros', methods=['GET'])
+@limites.por_usuario('leitura')
 @jwt_required(locations=["headers"])
+@resposta_em_cache(cache_respostas, versao_carros)
 def listar_carros():
+    """
+    Lista carros paginando por cursor.
+
+    Filtros: marca, modelo, ativo, preco_min, preco_max, ano_min, ano_max,
+    km_max, combustivel, cambio e q (busca em marca, modelo e descrição).
+    Ordenação: sort= (ver ORDENACOES); com q e sem sort, ordena por
+    relevância. Paginação: limit e cursor (proximo_cursor da página
+    anterior). fields= escolhe os campos e total_exato=1 força o count()
+    em vez da estimativa. O total só é calculado na primeira página.
+    """
     try:
         marca = request.args.get('marca')
         modelo = request.args.get('modelo')
         ativo = request.args.get('ativo')
+        combustivel = request.args.get('combustivel')
+        cambio = request.args.get('cambio')
+        termo = (request.args.get('q') or '').strip()
+        cursor = request.args.get('cursor')
+        sort = request.args.get('sort')
+
+        try:
+            preco_min = ler_numero('preco_min', float)
+            preco_max = ler_numero('preco_max', float)
+            ano_min = ler_numero('ano_min', int)
+            ano_max = ler_numero('ano_max', int)
+            km_max = ler_numero('km_max', int)
+            limite = min(int(request.args.get('limit', LIMITE_PADRAO_CARROS)), LIMITE_MAXIMO_CARROS)
+            campos = campos_solicitados(request.args.get('fields'))
+            if sort is not None and sort not in ORDENACOES:
+                raise ValueError(f"sort deve ser um de: {', '.join(ORDENACOES)}")
+        except (ValueError, TypeError) as e:
+            return jsonify({'message': f'Parâmetros inválidos: {str(e)}'}), 400
+        if limite < 1:
+            return jsonify({'message': 'limit deve ser maior que zero'}), 400
 
         query = Carro.query
         if marca:
@@ -235,9 +618,72 @@ def listar_carros():
             query = query.filter(Carro.modelo.ilike(f'%{modelo}%'))
         if ativo is not None:
             query = query.filter(Carro.ativo == (ativo.lower() == 'true'))
+        if preco_min is not None:
+            query = query.filter(Carro.preco >= preco_min)
+        if preco_max is not None:
+            query = query.filter(Carro.preco <= preco_max)
+        if ano_min is not None:
+            query = query.filter(Carro.ano >= ano_min)
+        if ano_max is not None:
+            query = query.filter(Carro.ano <= ano_max)
+        if km_max is not None:
+            query = query.filter(Carro.quilometragem <= km_max)
+        if combustivel:
+            query = query.filter(Carro.combustivel == combustivel)
+        if cambio:
+            query = query.filter(Carro.cambio == cambio)
+
+        relevancia = None
+        if termo:
+            query, relevancia = busca_carros.filtrar(query, Carro, termo)
+
+        # Chave de ordenação: sort explícito; na busca, relevância; senão mais recentes
+        if sort is None and relevancia is not None:
+            ordenacao, expressao, descendente = 'relevancia', relevancia, True
+        else:
+            ordenacao = sort or 'recentes'
+            expressao, descendente = ORDENACOES[ordenacao]
+            expressao = expressao_do_cursor(ordenacao, expressao)
+        nulavel = ordenacao in ORDENACOES_NULAVEIS
+
+        try:
+            posicao = decodificar_cursor(cursor, ordenacao) if cursor else None
+        except (ValueError, TypeError) as e:
+            return jsonify({'message': f'Parâmetros inválidos: {str(e)}'}), 400
+
+        total = None
+        if posicao is None:
+            if request.args.get('total_exato') == '1':
+                total = query.order_by(None).count()
+            else:
+                total = estimar_total(query)
+        else:
+            query = query.filter(filtro_apos_cursor(expressao, descendente, nulavel, posicao))
+
+        # id e a chave de ordenação sempre entram na consulta para montar o cursor
+        chave = expressao.label('chave_cursor')
+        colunas = [getattr(Carro, c) for c in dict.fromkeys(campos + ['id'])] + [chave]
+        if descendente:
+            ordem = (expressao.desc(), Carro.id.desc())
+        else:
+            ordem = (expressao.asc(), Carro.id.asc())
+        linhas = (query
+                  .with_entities(*colunas)
+                  .order_by(*ordem)
+                  .limit(limite + 1)
+                  .all())
+
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            ultima = linhas[-1]
+            proximo_cursor = codificar_cursor(ordenacao, ultima.chave_cursor, ultima.id)
 
-        carros = query.order_by(Carro.data_criacao.desc()).all()
-        return jsonify({'carros': [c.to_dict() for c in carros]}), 200
+        return jsonify({
+            'carros': serializar_linhas(linhas, campos),
+            'total': total,
+            'proximo_cursor': proximo_cursor
+        }), 200
 
     except Exception as e:
         print(f'Erro ao listar carros: {str(e)}')
@@ -245,7 +691,9 @@ def listar_carros():
 
 
 @app.route('/api/carros/<int:carro_id>', methods=['GET'])
+@limites.por_usuario('leitura')
 @jwt_required(locations=["headers"])
+@resposta_em_cache(cache_respostas, versao_carros)
 def buscar_carro(carro_id):
     try:
         carro = Carro.query.get(carro_id)
@@ -258,6 +706,7 @@ def buscar_carro(carro_id):
 
 
 @app.route('/api/carros', methods=['POST'])
+@limites.por_usuario('escrita')
 @jwt_required(locations=["headers"])
 def criar_carro():
     try:
@@ -283,7 +732,9 @@ def criar_carro():
         )
 
         db.session.add(carro)
-        db.session.commit()
+        with estatisticas_dashboard.escrita():
+            db.session.commit()
+            estatisticas_dashboard.registrar(depois=(carro.marca, carro.ativo, carro.preco))
         return jsonify({'message': 'Carro cadastrado com sucesso', 'carro': carro.to_dict()}), 201
 
     except Exception as e:
@@ -292,6 +743,7 @@ def criar_carro():
         return jsonify({'message': 'Erro ao criar carro'}), 500
 
 @app.route('/api/carros/<int:carro_id>', methods=['PUT'])
+@limites.por_usuario('escrita')
 @jwt_required(locations=["headers"])
 def atualizar_carro(carro_id):
     try:
@@ -301,6 +753,7 @@ def atualizar_carro(carro_id):
         if not carro:
             return jsonify({'message': 'Carro não encontrado'}), 404
 
+        antes = (carro.marca, carro.ativo, carro.preco)
         campos_permitidos = ['marca', 'modelo', 'ano', 'preco', 'cor', 'quilometragem',
                               'combustivel', 'cambio', 'descricao', 'imagem_url', 'ativo']
 
@@ -316,7 +769,9 @@ def atualizar_carro(carro_id):
                     valor = bool(valor)
                 setattr(carro, campo, valor)
 
-        db.session.commit()
+        with estatisticas_dashboard.escrita():
+            db.session.commit()
+            estatisticas_dashboard.registrar(antes=antes, depois=(carro.marca, carro.ativo, carro.preco))
         return jsonify({'message': 'Carro atualizado com sucesso', 'carro': carro.to_dict()}), 200
 
     except Exception as e:
@@ -325,6 +780,7 @@ def atualizar_carro(carro_id):
         return jsonify({'message': 'Erro ao atualizar carro'}), 500
 
 @app.route('/api/carros/<int:carro_id>', methods=['DELETE'])
+@limites.por_usuario('escrita')
 @jwt_required(locations=["headers"])
 def deletar_carro(carro_id):
     try:
@@ -332,8 +788,11 @@ def deletar_carro(carro_id):
         if not carro:
             return jsonify({'message': 'Carro não encontrado'}), 404
 
+        antes = (carro.marca, carro.ativo, carro.preco)
         db.session.delete(carro)
-        db.session.commit()
+        with estatisticas_dashboard.escrita():
+            db.session.commit()
+            estatisticas_dashboard.registrar(antes=antes)
         return jsonify({'message': 'Carro removido com sucesso'}), 200
 
     except Exception as e:
@@ -342,6 +801,114 @@ def deletar_carro(carro_id):
         return jsonify({'message': 'Erro ao deletar carro'}), 500
 
 
+# =====================
+# IMPORTACAO / EXPORTACAO DE CARROS
+# =====================
+
+TAMANHO_LOTE_IMPORTACAO = 1000
+MAX_ERROS_IMPORTACAO = 100
+
+
+@app.route('/api/carros/import', methods=['POST'])
+@limites.por_usuario('escrita')
+@jwt_required(locations=["headers"])
+def importar_carros():
+    """
+    Importa carros de um CSV (text/csv, com cabeçalho) ou NDJSON
+    (application/x-ndjson) lido em stream do corpo da requisição. Grava em
+    lotes, com um commit por lote, e devolve os erros por linha. Se a
+    importação parar no meio, a resposta 500 traz o mesmo relatório com o
+    que já foi gravado (os lotes anteriores continuam no banco).
+    """
+    recebidos = importados = rejeitados = 0
+    erros = []
+    try:
+        usuario_id = int(get_jwt_identity())
+        registros = ler_registros(request.stream, request.mimetype)
+
+        while True:
+            lote = list(islice(registros, TAMANHO_LOTE_IMPORTACAO))
+            if not lote:
+                break
+
+            # O relatório só conta o lote depois do commit
+            linhas, erros_lote = [], []
+            for numero, registro in enumerate(lote, start=recebidos + 1):
+                linha, erro = converter_registro(registro, usuario_id)
+                if erro:
+                    erros_lote.append({'linha': numero, 'erro': erro})
+                    continue
+                linhas.append(linha)
+
+            if linhas:
+                db.session.execute(Carro.__table__.insert(), linhas)
+                # Insert em massa não passa pelos eventos do ORM
+                db.session.info['carros_alterados'] = True
+                with estatisticas_dashboard.escrita():
+                    db.session.commit()
+                    for linha in linhas:
+                        estatisticas_dashboard.registrar(
+                            depois=(linha['marca'], linha['ativo'], linha['preco']))
+
+            recebidos += len(lote)
+            importados += len(linhas)
+            rejeitados += len(erros_lote)
+            erros.extend(erros_lote[:MAX_ERROS_IMPORTACAO - len(erros)])
+
+        return jsonify({
+            'recebidos': recebidos,
+            'importados': importados,
+            'rejeitados': rejeitados,
+            'erros': erros
+        }), 201 if importados else 400
+
+    except Exception as e:
+        db.session.rollback()
+        print(f'Erro ao importar carros: {str(e)}')
+        return jsonify({
+            'message': 'Erro ao importar carros',
+            'recebidos': recebidos,
+            'importados': importados,
+            'rejeitados': rejeitados,
+            'erros': erros
+        }), 500
+
+
+@app.route('/api/carros/export', methods=['GET'])
+@limites.por_usuario('leitura')
+@jwt_required(locations=["headers"])
+def exportar_carros():
+    """
+    Exporta todos os carros em CSV (padrão) ou NDJSON (?formato=ndjson).
+    As linhas são lidas com yield_per (cursor no servidor no PostgreSQL) e
+    enviadas conforme são lidas, sem montar a lista inteira em memória.
+    """
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'message': 'formato deve ser csv ou ndjson'}), 400
+
+    def linhas():
+        query = (db.session.query(*[getattr(Carro, c) for c in COLUNAS_EXPORTACAO])
+                 .order_by(Carro.id)
+                 .execution_options(stream_results=True)
+                 .yield_per(1000))
+        try:
+            yield from query
+        finally:
+            db.session.close()
+
+    if formato == 'ndjson':
+        corpo, mimetype = gerar_ndjson(linhas()), TIPOS_NDJSON[0]
+    else:
+        corpo, mimetype = gerar_csv(linhas()), 'text/csv'
+
+    return Response(
+        stream_with_context(corpo),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=carros.{formato}'}
+    )
+
+
 # =====================
 # ROTAS DE DASHBOARD
 # =====================
@@ -378,45 +945,13 @@ def listar_atividades_dashboard():
 @jwt_required(locations=["headers"])
 def buscar_estatisticas_dashboard():
     """
-    Calcula e retorna estatísticas chave para o painel de carros,
-    consultando o banco de dados.
+    Calcula e retorna estatísticas chave para o painel de carros.
+    Os números vêm do cache em memória, mantido pelas rotas de CRUD;
+    ?fresh=1 força o recálculo a partir do banco.
     """
     try:
-        # 1. Total de Carros
-        total_carros = db.session.query(Carro).count()
-        
-        # 2. Carros Disponíveis (ativo=True)
-        carros_disponiveis = db.session.query(Carro).filter(Carro.ativo == True).count()
-
-        # 3. Carros Vendidos (ativo=False)
-        # Assumindo que um carro não-ativo foi 'vendido'
-        carros_vendidos = db.session.query(Carro).filter(Carro.ativo == False).count()
-
-        # 4. Valor Total em Estoque (apenas carros ativos)
-        valor_total_estoque_ativo = db.session.query(func.sum(Carro.preco)).filter(Carro.ativo == True).scalar()
-        if valor_total_estoque_ativo is None:
-             valor_total_estoque_ativo = 0.0 # Garante 0 se não houver carros
-
-        # 5. Carros por Categoria (Agrupado por Marca)
-        carros_por_categoria_query = db.session.query(
-            Carro.marca.label('categoria'), 
-            func.count(Carro.id).label('total')
-        ).group_by(Carro.marca).all()
-        
-        carros_por_categoria = [
-            {'categoria': row.categoria, 'total': row.total}
-            for row in carros_por_categoria_query
-        ]
-
-        # 6. Estrutura de Resposta
-        resposta = {
-            'total_carros': total_carros,
-            'carros_disponiveis': carros_disponiveis,
-            'carros_vendidos': carros_vendidos,
-            'valor_total_estoque': float(valor_total_estoque_ativo),
-            'carros_por_categoria': carros_por_categoria
-        }
-        
+        fresh = request.args.get('fresh') == '1'
+        resposta = estatisticas_dashboard.obter(agregar_estatisticas_carros, fresh=fresh)
         return jsonify(resposta), 200
 
     except Exception as e:
@@ -425,6 +960,21 @@ def buscar_estatisticas_dashboard():
         return jsonify({'message': 'Erro interno ao calcular estatísticas'}), 500
 
 
+def agregar_estatisticas_carros():
+    """
+    Uma única consulta (uma varredura de carros) com agregação condicional
+    por marca: total, disponíveis (ativo=True), vendidos (ativo=False) e
+    valor em estoque dos ativos.
+    """
+    return db.session.query(
+        Carro.marca,
+        func.count(Carro.id),
+        func.sum(case((Carro.ativo == True, 1), else_=0)),
+        func.sum(case((Carro.ativo == False, 1), else_=0)),
+        func.sum(case((Carro.ativo == True, Carro.preco), else_=0.0))
+    ).group_by(Carro.marca).all()
+
+
 # =====================
 # MAIN
 # =====================
@@ -433,6 +983,8 @@ if __name__ == '__main__':
     with app.app_context():
         # Cria as tabelas se não existirem
         db.create_all()
+        garantir_indices()
+        busca_carros.preparar()
     
     # Inicia o servidor Flask
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
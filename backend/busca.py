@@ -0,0 +1,154 @@
+"""
+Busca textual de carros (parâmetro ?q= de /api/carros).
+
+PostgreSQL: índice GIN de tsvector sobre marca, modelo e descricao para a
+busca por palavras, mais índices pg_trgm em marca/modelo para tolerar erros
+de digitação (e para o ilike '%x%' dos filtros marca/modelo usar índice).
+
+SQLite (usuarios.db de desenvolvimento): tabela virtual FTS5 sincronizada
+com carros por triggers. Se o SQLite não tiver FTS5, cai no ilike.
+
+O schema do backend é criado por db.create_all(), então os objetos de busca
+são criados aqui de forma idempotente por preparar(), chamado na subida do
+servidor, no `flask preparar-banco` e no seed. As requisições nunca rodam DDL:
+se os objetos não existirem, a busca usa o ilike.
+"""
+
+import re
+
+from sqlalchemy import Float, cast, column, func, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+
+
+CONFIG_TEXTO = "'portuguese'"
+
+# Expressão indexada; precisa ser idêntica na criação do índice e na consulta
+DOCUMENTO_PG = ("coalesce(marca, '') || ' ' || coalesce(modelo, '') || ' ' || "
+                "coalesce(descricao, '')")
+
+DDL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_carros_busca_tsv ON carros "
+    f"USING gin (to_tsvector({CONFIG_TEXTO}, {DOCUMENTO_PG}))",
+    "CREATE INDEX IF NOT EXISTS ix_carros_marca_trgm ON carros USING gin (marca gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_carros_modelo_trgm ON carros USING gin (modelo gin_trgm_ops)",
+]
+
+DDL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS carros_fts USING fts5("
+    "marca, modelo, descricao, content='carros', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS carros_fts_ai AFTER INSERT ON carros BEGIN "
+    "INSERT INTO carros_fts(rowid, marca, modelo, descricao) "
+    "VALUES (new.id, new.marca, new.modelo, new.descricao); END",
+    "CREATE TRIGGER IF NOT EXISTS carros_fts_ad AFTER DELETE ON carros BEGIN "
+    "INSERT INTO carros_fts(carros_fts, rowid, marca, modelo, descricao) "
+    "VALUES ('delete', old.id, old.marca, old.modelo, old.descricao); END",
+    "CREATE TRIGGER IF NOT EXISTS carros_fts_au AFTER UPDATE ON carros BEGIN "
+    "INSERT INTO carros_fts(carros_fts, rowid, marca, modelo, descricao) "
+    "VALUES ('delete', old.id, old.marca, old.modelo, old.descricao); "
+    "INSERT INTO carros_fts(rowid, marca, modelo, descricao) "
+    "VALUES (new.id, new.marca, new.modelo, new.descricao); END",
+]
+
+carros_fts = table('carros_fts', column('rowid'), column('carros_fts'))
+
+
+class BuscaCarros:
+
+    def __init__(self, db):
+        self.db = db
+        self.modo = None  # 'postgresql', 'fts5' ou 'ilike'
+
+    def preparar(self):
+        """Cria extensões, índices e a tabela FTS conforme o banco em uso."""
+        db = self.db
+        dialeto = db.engine.dialect.name
+
+        if dialeto == 'postgresql':
+            with db.engine.begin() as conexao:
+                for comando in DDL_POSTGRES:
+                    conexao.execute(text(comando))
+            self.modo = 'postgresql'
+            return
+
+        if dialeto == 'sqlite':
+            try:
+                with db.engine.begin() as conexao:
+                    existia = conexao.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'carros_fts'"
+                    )).first()
+                    for comando in DDL_SQLITE:
+                        conexao.execute(text(comando))
+                    if not existia:
+                        # Indexa os carros que já estavam no banco
+                        conexao.execute(text("INSERT INTO carros_fts(carros_fts) VALUES ('rebuild')"))
+                self.modo = 'fts5'
+                return
+            except OperationalError as e:
+                print(f'FTS5 indisponível, busca usará ilike: {str(e)}')
+
+        self.modo = 'ilike'
+
+    def detectar(self):
+        """
+        Descobre o modo pelos objetos já criados no banco, só com leituras
+        do catálogo. Sem eles (preparar() ainda não rodou) a busca usa o ilike.
+        """
+        db = self.db
+        dialeto = db.engine.dialect.name
+        self.modo = 'ilike'
+        with db.engine.connect() as conexao:
+            if dialeto == 'postgresql':
+                indices = {nome for (nome,) in conexao.execute(text(
+                    "SELECT indexname FROM pg_indexes WHERE tablename = 'carros' "
+                    "AND schemaname = current_schema()"))}
+                if {'ix_carros_busca_tsv', 'ix_carros_marca_trgm', 'ix_carros_modelo_trgm'} <= indices:
+                    self.modo = 'postgresql'
+            elif dialeto == 'sqlite':
+                if conexao.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'carros_fts'")).first():
+                    self.modo = 'fts5'
+
+    def filtrar(self, query, Carro, termo):
+        """
+        Aplica a busca à query. Retorna (query, expressão de relevância),
+        onde maior relevância significa resultado melhor.
+        """
+        tokens = re.findall(r'\w+', termo, flags=re.UNICODE)
+        if not tokens:
+            return query, None
+
+        if self.modo is None:
+            self.detectar()
+
+        if self.modo == 'postgresql':
+            documento = func.to_tsvector(literal_column(CONFIG_TEXTO), literal_column(DOCUMENTO_PG))
+            consulta = func.to_tsquery(literal_column(CONFIG_TEXTO),
+                                       ' & '.join(f'{t}:*' for t in tokens))
+            frase = ' '.join(tokens)
+            query = query.filter(or_(
+                documento.op('@@')(consulta),
+                Carro.marca.op('%')(frase),
+                Carro.modelo.op('%')(frase),
+            ))
+            relevancia = (func.ts_rank(documento, consulta)
+                          + func.greatest(func.similarity(Carro.marca, frase),
+                                          func.similarity(Carro.modelo, frase)))
+            # ts_rank/similarity são real; em double o valor do cursor volta idêntico
+            return query, cast(relevancia, Float(precision=53))
+
+        if self.modo == 'fts5':
+            expressao = ' '.join(f'"{t}"*' for t in tokens)
+            query = (query
+                     .join(carros_fts, carros_fts.c.rowid == Carro.id)
+                     .filter(carros_fts.c.carros_fts.op('MATCH')(expressao)))
+            # bm25 é menor para os mais relevantes
+            return query, -func.bm25(literal_column('carros_fts'))
+
+        for token in tokens:
+            padrao = f'%{token}%'
+            query = query.filter(or_(Carro.marca.ilike(padrao),
+                                     Carro.modelo.ilike(padrao),
+                                     Carro.descricao.ilike(padrao)))
+        return query, None
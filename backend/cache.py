@@ -0,0 +1,154 @@
+"""
+Cache de respostas JSON com ETag para as rotas de leitura de carros.
+
+Cada tabela tem um contador de versão incrementado após o commit de qualquer
+inserção, atualização ou remoção. A versão entra no ETag e na chave do
+cache, então uma escrita invalida tudo de uma vez, sem varrer o cache. O
+contador começa no instante da inicialização (em nanossegundos), não em 0,
+para um ETag guardado pelo cliente não voltar a valer depois de um restart
+nem bater com o de outro worker.
+
+Sem REDIS_URL o contador e os corpos ficam na memória do processo (cada
+worker tem o seu). Com REDIS_URL os dois são compartilhados entre workers.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+try:
+    import redis
+except ImportError:  # redis é opcional
+    redis = None
+
+
+class VersaoTabela:
+
+    def __init__(self, nome, cliente_redis=None):
+        self.nome = nome
+        self.redis = cliente_redis
+        self._versao = time.time_ns()
+        self._lock = threading.Lock()
+
+    def atual(self):
+        if self.redis is not None:
+            chave = f'versao:{self.nome}'
+            versao = self.redis.get(chave)
+            if versao is None:
+                # Redis novo ou chave removida: começa do instante atual, como na memória
+                self.redis.set(chave, time.time_ns(), nx=True)
+                versao = self.redis.get(chave)
+            return int(versao)
+        return self._versao
+
+    def incrementar(self):
+        if self.redis is not None:
+            self.atual()
+            return self.redis.incr(f'versao:{self.nome}')
+        with self._lock:
+            self._versao += 1
+            return self._versao
+
+
+class CacheLRU:
+    """
+    Corpos de resposta serializados, limitados por quantidade de entradas e
+    por idade (ttl em segundos, como no CacheRedis).
+    """
+
+    def __init__(self, max_itens=512, ttl=300):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, corpo = item
+            if time.monotonic() >= expira_em:
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return corpo
+
+    def guardar(self, chave, corpo):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, corpo)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+class CacheRedis:
+    """Mesma interface do CacheLRU, com expiração no Redis."""
+
+    def __init__(self, cliente_redis, ttl=300):
+        self.redis = cliente_redis
+        self.ttl = ttl
+
+    def obter(self, chave):
+        return self.redis.get(f'resposta:{chave}')
+
+    def guardar(self, chave, corpo):
+        self.redis.setex(f'resposta:{chave}', self.ttl, corpo)
+
+    def limpar(self):
+        # As chaves antigas deixam de ser usadas quando a versão muda e expiram sozinhas
+        pass
+
+
+def criar_cache(redis_url=None, max_itens=512, ttl=300):
+    """Retorna (cliente_redis, cache) conforme a configuração."""
+    if redis_url and redis is not None:
+        cliente = redis.Redis.from_url(redis_url)
+        return cliente, CacheRedis(cliente, ttl)
+    if redis_url:
+        print('REDIS_URL definido, mas o pacote redis não está instalado; usando cache em memória')
+    return None, CacheLRU(max_itens, ttl)
+
+
+def resposta_em_cache(cache, versao):
+    """
+    Decorator para rotas GET que devolvem JSON. Responde 304 quando o
+    If-None-Match bate com o ETag atual e, fora isso, serve o corpo guardado
+    para a mesma versão da tabela e a mesma URL (path + query string).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            numero = versao.atual()
+            url = request.full_path
+            resumo = hashlib.sha1(url.encode()).hexdigest()[:16]
+            etag = f'{versao.nome}-{numero}-{resumo}'
+            chave = f'{versao.nome}:{numero}:{url}'
+
+            if etag in request.if_none_match:
+                resposta = make_response('', 304)
+            else:
+                corpo = cache.obter(chave)
+                if corpo is not None:
+                    resposta = make_response(corpo, 200)
+                    resposta.mimetype = 'application/json'
+                else:
+                    resposta = make_response(view(*args, **kwargs))
+                    if resposta.status_code != 200:
+                        return resposta
+                    cache.guardar(chave, resposta.get_data())
+
+            resposta.set_etag(etag)
+            # O navegador guarda, mas sempre revalida com If-None-Match
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+"""
+Cache em memória das estatísticas do dashboard.
+
+Os agregados ficam guardados por marca e são ajustados a cada criação,
+atualização ou remoção de carro, então o /api/dashboard/stats não precisa
+varrer a tabela a cada acesso. Cada processo (worker do gunicorn/waitress)
+tem o seu cache; o TTL limita por quanto tempo um worker pode ficar com
+dados desatualizados por escritas feitas em outro worker.
+
+Um recálculo que coincide com uma escrita não sabe se a consulta já viu
+aquela linha; aplicar o ajuste por cima poderia contá-la duas vezes. Por
+isso as escritas ficam dentro de escrita() e o resultado de um recálculo
+concorrente com alguma delas é devolvido, mas não guardado.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class EstatisticasDashboard:
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._por_marca = None
+        self._carregado_em = 0.0
+        self._escritas_em_andamento = 0
+        self._geracao = 0  # muda no início e no fim de cada escrita
+        self._lock = threading.Lock()
+
+    def obter(self, carregar, fresh=False):
+        """
+        Retorna a resposta do dashboard. `carregar` é chamado para refazer os
+        agregados quando o cache está vazio, expirado ou fresh=True; deve
+        retornar linhas (marca, total, disponiveis, vendidos, valor_estoque).
+        """
+        with self._lock:
+            expirado = time.monotonic() - self._carregado_em > self.ttl
+            if not (fresh or expirado or self._por_marca is None):
+                return self._montar_resposta(self._por_marca)
+            geracao = self._geracao
+            concorrente = self._escritas_em_andamento > 0
+
+        por_marca = {
+            linha[0]: [linha[1], linha[2], linha[3], float(linha[4] or 0.0)]
+            for linha in carregar()
+        }
+
+        with self._lock:
+            if concorrente or geracao != self._geracao:
+                # Alguma escrita cruzou a consulta: o próximo acesso recalcula
+                self._por_marca = None
+            else:
+                self._por_marca = por_marca
+                self._carregado_em = time.monotonic()
+            return self._montar_resposta(por_marca)
+
+    @contextmanager
+    def escrita(self):
+        """Envolve o commit de uma escrita em carros e o registrar() correspondente."""
+        with self._lock:
+            self._escritas_em_andamento += 1
+            self._geracao += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._escritas_em_andamento -= 1
+                self._geracao += 1
+
+    def invalidar(self):
+        with self._lock:
+            self._por_marca = None
+
+    def registrar(self, antes=None, depois=None):
+        """
+        Ajusta os agregados após uma escrita. `antes` e `depois` são tuplas
+        (marca, ativo, preco) do carro antes e depois da operação; use None
+        para o lado inexistente (criação ou remoção).
+        """
+        with self._lock:
+            if self._por_marca is None:
+                return
+            if antes is not None:
+                self._aplicar(antes, -1)
+            if depois is not None:
+                self._aplicar(depois, 1)
+
+    def _aplicar(self, carro, sinal):
+        marca, ativo, preco = carro
+        agregado = self._por_marca.setdefault(marca, [0, 0, 0, 0.0])
+        agregado[0] += sinal
+        if ativo is True:
+            agregado[1] += sinal
+            agregado[3] += sinal * float(preco or 0.0)
+        elif ativo is False:
+            agregado[2] += sinal
+        if agregado[0] <= 0:
+            del self._por_marca[marca]
+
+    @staticmethod
+    def _montar_resposta(por_marca):
+        agregados = por_marca.values()
+        return {
+            'total_carros': sum(a[0] for a in agregados),
+            'carros_disponiveis': sum(a[1] for a in agregados),
+            'carros_vendidos': sum(a[2] for a in agregados),
+            'valor_total_estoque': round(sum(a[3] for a in agregados), 2),
+            'carros_por_categoria': [
+                {'categoria': marca, 'total': a[0]}
+                for marca, a in sorted(por_marca.items())
+            ]
+        }
@@ -0,0 +1,139 @@
+"""
+Leitura e escrita de carros em CSV e NDJSON para importação/exportação em
+massa. As funções trabalham com iteradores, sem carregar o arquivo inteiro.
+"""
+
+import codecs
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+
+# Colunas aceitas na importação e escritas na exportação
+COLUNAS_IMPORTACAO = ('marca', 'modelo', 'ano', 'preco', 'cor', 'quilometragem',
+                      'combustivel', 'cambio', 'descricao', 'imagem_url', 'ativo')
+
+COLUNAS_EXPORTACAO = ('id',) + COLUNAS_IMPORTACAO + ('data_criacao', 'usuario_id')
+
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Tamanho máximo das colunas de texto de carros (descricao é Text, sem limite)
+TAMANHOS_TEXTO = {'marca': 120, 'modelo': 120, 'cor': 50, 'combustivel': 50,
+                  'cambio': 50, 'imagem_url': 500}
+
+
+def ler_registros(stream, mimetype):
+    """Gera dicionários a partir do corpo da requisição (CSV ou NDJSON)."""
+    linhas = codecs.iterdecode(stream, 'utf-8-sig')
+
+    if mimetype in TIPOS_NDJSON:
+        for linha in linhas:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                yield None
+        return
+
+    for registro in csv.DictReader(linhas):
+        yield registro
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'sim', 's', 'yes')
+
+
+def converter_registro(registro, usuario_id):
+    """
+    Valida um registro importado e devolve a linha para o insert.
+    Retorna (linha, None) ou (None, mensagem de erro).
+    """
+    if not isinstance(registro, dict):
+        return None, 'Registro inválido'
+
+    if not all(registro.get(campo) not in (None, '') for campo in ('marca', 'modelo', 'ano', 'preco')):
+        return None, 'Campos obrigatórios: marca, modelo, ano, preco'
+
+    for campo in ('marca', 'modelo'):
+        # Números viram texto (ex: modelo 320 no NDJSON); objetos e listas não
+        if isinstance(registro[campo], (int, float)) and not isinstance(registro[campo], bool):
+            registro = dict(registro, **{campo: str(registro[campo])})
+
+    for campo in ('marca', 'modelo', 'cor', 'combustivel', 'cambio', 'descricao', 'imagem_url'):
+        valor = registro.get(campo)
+        if valor is not None and not isinstance(valor, str):
+            return None, f'{campo} deve ser texto'
+        if valor and campo in TAMANHOS_TEXTO and len(valor) > TAMANHOS_TEXTO[campo]:
+            return None, f'{campo} deve ter no máximo {TAMANHOS_TEXTO[campo]} caracteres'
+
+    try:
+        linha = {
+            'marca': registro['marca'],
+            'modelo': registro['modelo'],
+            'ano': int(registro['ano']),
+            'preco': float(registro['preco']),
+            'quilometragem': int(registro.get('quilometragem') or 0),
+            'ativo': _booleano(registro['ativo']) if registro.get('ativo') not in (None, '') else True,
+            'usuario_id': usuario_id,
+        }
+    except (TypeError, ValueError, OverflowError):
+        return None, 'ano, preco e quilometragem devem ser numéricos'
+    if not math.isfinite(linha['preco']):
+        # float() aceita "nan" e "inf", e o json.loads aceita NaN e Infinity
+        return None, 'preco deve ser um número finito'
+
+    for campo in ('cor', 'combustivel', 'cambio', 'descricao', 'imagem_url'):
+        valor = registro.get(campo)
+        linha[campo] = None if valor == '' else valor
+
+    return linha, None
+
+
+def _valor_exportado(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def gerar_csv(linhas):
+    """Gera o CSV em pedaços (cabeçalho + uma linha por carro)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS_EXPORTACAO)
+
+    for linha in linhas:
+        escritor.writerow([_valor_exportado(v) for v in linha])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def gerar_ndjson(linhas):
+    """Gera um objeto JSON por linha, agrupando a saída em pedaços."""
+    pedaco = []
+    for linha in linhas:
+        item = {coluna: _valor_exportado(valor) for coluna, valor in zip(COLUNAS_EXPORTACAO, linha)}
+        if orjson is not None:
+            pedaco.append(orjson.dumps(item).decode())
+        else:
+            pedaco.append(json.dumps(item, ensure_ascii=False))
+        if len(pedaco) >= 500:
+            yield '\n'.join(pedaco) + '\n'
+            pedaco = []
+
+    if pedaco:
+        yield '\n'.join(pedaco) + '\n'
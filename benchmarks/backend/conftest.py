@@ -0,0 +1,78 @@
+"""
+Fixtures da suíte da API de carros (backend/app.py).
+
+backend/app.py é carregado como módulo "backend_app" para não colidir com o
+pacote app/ do rastreamento quando as duas suítes rodam juntas.
+"""
+
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+from medicao import TAMANHOS
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND = os.path.join(RAIZ, 'backend')
+
+os.environ['SQLALCHEMY_DATABASE_URI'] = os.getenv('BENCH_DATABASE_URL') or \
+    'sqlite:///' + os.path.join(tempfile.gettempdir(), 'bench_backend.db')
+os.environ.pop('REDIS_URL', None)
+
+sys.path.insert(0, BACKEND)
+_spec = importlib.util.spec_from_file_location('backend_app', os.path.join(BACKEND, 'app.py'))
+backend = importlib.util.module_from_spec(_spec)
+sys.modules['backend_app'] = backend
+_spec.loader.exec_module(backend)
+
+import seed  # noqa: E402  (backend/seed.py; não importa o app)
+
+
+def popular(tamanho):
+    """
+    Recria as tabelas com `tamanho` carros e 10 usuários gerados por
+    backend/seed.py (usuario0@seed.com ... usuario9@seed.com, senha seed.SENHA_GERADA).
+    """
+    db = backend.db
+    db.session.remove()
+    with db.engine.begin() as conexao:
+        if db.engine.dialect.name == 'sqlite':
+            conexao.exec_driver_sql('DROP TABLE IF EXISTS carros_fts')
+    db.drop_all()
+    db.create_all()
+    backend.garantir_indices()
+
+    sorteio = random.Random(42)
+    hash_senha = backend.gerar_hash(seed.SENHA_GERADA, backend.app.config['SENHA_HASH_METODO'])
+    with db.engine.begin() as conexao:
+        seed.inserir_em_lotes(conexao, backend.Usuario.__table__, seed.gerar_usuarios(10, hash_senha, sorteio))
+        usuario_ids = [linha.id for linha in conexao.execute(backend.Usuario.__table__.select())]
+        seed.inserir_em_lotes(conexao, backend.Carro.__table__, seed.gerar_carros(tamanho, usuario_ids, sorteio))
+
+    backend.busca_carros.modo = None
+    backend.busca_carros.preparar()
+    backend.versao_carros.incrementar()
+    backend.estatisticas_dashboard.invalidar()
+    db.session.remove()
+
+
+@pytest.fixture(scope='session', params=TAMANHOS, ids=lambda t: f'{t}carros')
+def tamanho(request):
+    with backend.app.app_context():
+        popular(request.param)
+    return request.param
+
+
+@pytest.fixture
+def cliente(tamanho):
+    return backend.app.test_client()
+
+
+@pytest.fixture
+def cabecalhos(cliente):
+    resposta = cliente.post('/login', json={'email': 'usuario0@seed.com', 'senha': seed.SENHA_GERADA})
+    return {'Authorization': f"Bearer {resposta.get_json()['access_token']}"}
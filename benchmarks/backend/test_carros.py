@@ -0,0 +1,48 @@
+import pytest
+
+import backend_app as backend
+
+
+CONSULTAS = {
+    'padrao': '/api/carros',
+    'filtros': '/api/carros?marca=Toyota&ativo=true&preco_min=80000&preco_max=200000',
+    'ano_km': '/api/carros?ano_min=2018&km_max=50000&sort=preco_asc',
+    'busca': '/api/carros?q=corolla',
+    'ordenacao_preco': '/api/carros?sort=preco_desc&limit=100',
+    'total_exato': '/api/carros?ativo=true&total_exato=1',
+}
+
+
+@pytest.mark.parametrize('consulta', sorted(CONSULTAS))
+def test_listar_sem_cache(medir, cliente, cabecalhos, tamanho, consulta):
+    url = CONSULTAS[consulta]
+
+    def listar():
+        # Nova versão da tabela a cada chamada: mede a consulta, não o cache de respostas
+        backend.versao_carros.incrementar()
+        return cliente.get(url, headers=cabecalhos)
+
+    medir(f'GET /api/carros [{consulta}]', listar, tamanho=tamanho)
+
+
+def test_listar_com_cache(medir, cliente, cabecalhos, tamanho):
+    medir('GET /api/carros [cache]', lambda: cliente.get(CONSULTAS['filtros'], headers=cabecalhos),
+          tamanho=tamanho)
+
+
+def test_segunda_pagina(medir, cliente, cabecalhos, tamanho):
+    cursor = cliente.get('/api/carros', headers=cabecalhos).get_json()['proximo_cursor']
+
+    def pagina():
+        backend.versao_carros.incrementar()
+        return cliente.get(f'/api/carros?cursor={cursor}', headers=cabecalhos)
+
+    medir('GET /api/carros [cursor]', pagina, tamanho=tamanho)
+
+
+def test_buscar_por_id(medir, cliente, cabecalhos, tamanho):
+    def buscar():
+        backend.versao_carros.incrementar()
+        return cliente.get(f'/api/carros/{tamanho // 2 or 1}', headers=cabecalhos)
+
+    medir('GET /api/carros/<id>', buscar, tamanho=tamanho)
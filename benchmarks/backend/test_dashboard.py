@@ -0,0 +1,8 @@
+def test_stats_em_cache(medir, cliente, cabecalhos, tamanho):
+    medir('GET /api/dashboard/stats', lambda: cliente.get('/api/dashboard/stats', headers=cabecalhos),
+          tamanho=tamanho)
+
+
+def test_stats_recalculado(medir, cliente, cabecalhos, tamanho):
+    medir('GET /api/dashboard/stats?fresh=1',
+          lambda: cliente.get('/api/dashboard/stats?fresh=1', headers=cabecalhos), tamanho=tamanho)
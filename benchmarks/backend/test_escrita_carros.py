@@ -0,0 +1,27 @@
+import itertools
+
+
+NOVO_CARRO = {
+    'marca': 'Fiat', 'modelo': 'Argo', 'ano': 2022, 'preco': 78000,
+    'cor': 'Branco', 'quilometragem': 12000, 'combustivel': 'Flex', 'cambio': 'Manual',
+}
+
+
+def test_crud(medir, cliente, cabecalhos, tamanho):
+    criados = []
+
+    def criar():
+        resposta = cliente.post('/api/carros', json=NOVO_CARRO, headers=cabecalhos)
+        criados.append(resposta.get_json()['carro']['id'])
+        return resposta
+
+    medir('POST /api/carros', criar, tamanho=tamanho)
+
+    ids = itertools.cycle(list(criados))
+    medir('PUT /api/carros/<id>',
+          lambda: cliente.put(f'/api/carros/{next(ids)}', json={'preco': 79000}, headers=cabecalhos),
+          tamanho=tamanho)
+
+    medir('DELETE /api/carros/<id>',
+          lambda: cliente.delete(f'/api/carros/{criados.pop()}', headers=cabecalhos),
+          tamanho=tamanho, repeticoes=len(criados) - 1)
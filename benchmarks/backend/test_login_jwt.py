@@ -0,0 +1,11 @@
+import seed
+
+
+def test_login(medir, cliente, tamanho):
+    # Dominado pelo custo do hash configurado em SENHA_HASH_METODO
+    dados = {'email': 'usuario3@seed.com', 'senha': seed.SENHA_GERADA}
+    medir('POST /login', lambda: cliente.post('/login', json=dados), tamanho=tamanho, repeticoes=5)
+
+
+def test_perfil(medir, cliente, cabecalhos, tamanho):
+    medir('GET /api/perfil', lambda: cliente.get('/api/perfil', headers=cabecalhos), tamanho=tamanho)
@@ -0,0 +1,63 @@
+"""
+Orçamento de consultas SQL por rota da API de carros. Um aumento aqui
+(lazy load novo, N+1, consulta duplicada) falha o teste; se a mudança for
+intencional, atualize o número junto com a explicação no commit.
+"""
+
+import pytest
+
+import backend_app as backend
+
+
+LEITURAS = {
+    '/api/carros': 2,
+    '/api/carros?marca=Toyota&ativo=true&preco_min=80000': 2,
+    '/api/carros?q=corolla&sort=preco_asc': 2,
+    '/api/carros?ativo=true&total_exato=1': 2,
+    '/api/carros/5': 1,
+    '/api/dashboard/stats?fresh=1': 1,
+    '/api/perfil': 0,
+    '/health': 0,
+}
+
+
+@pytest.fixture
+def engine():
+    with backend.app.app_context():
+        return backend.db.engine
+
+
+@pytest.mark.parametrize('url', sorted(LEITURAS))
+def test_orcamento_leitura(cliente, cabecalhos, contar_consultas, engine, url):
+    cliente.get(url, headers=cabecalhos)  # aquece caches de identidade e de busca
+    backend.versao_carros.incrementar()   # sem o cache de respostas
+
+    with contar_consultas(engine) as consultas:
+        resposta = cliente.get(url, headers=cabecalhos)
+
+    assert resposta.status_code == 200
+    assert consultas.total <= LEITURAS[url], consultas.resumo()
+    assert not consultas.repetidos(), consultas.resumo()
+
+
+def test_orcamento_escrita(cliente, cabecalhos, contar_consultas, engine):
+    carro = {'marca': 'Fiat', 'modelo': 'Argo', 'ano': 2022, 'preco': 78000}
+
+    with contar_consultas(engine) as consultas:
+        carro_id = cliente.post('/api/carros', json=carro, headers=cabecalhos).get_json()['carro']['id']
+    assert consultas.total <= 2, consultas.resumo()
+
+    with contar_consultas(engine) as consultas:
+        cliente.put(f'/api/carros/{carro_id}', json={'preco': 79000}, headers=cabecalhos)
+    assert consultas.total <= 3, consultas.resumo()
+
+    with contar_consultas(engine) as consultas:
+        cliente.delete(f'/api/carros/{carro_id}', headers=cabecalhos)
+    assert consultas.total <= 2, consultas.resumo()
+
+
+def test_orcamento_login(cliente, contar_consultas, engine):
+    with contar_consultas(engine) as consultas:
+        resposta = cliente.post('/login', json={'email': 'usuario1@seed.com', 'senha': 'user123'})
+    assert resposta.status_code == 200
+    assert consultas.total <= 1, consultas.resumo()
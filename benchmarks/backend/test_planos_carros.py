@@ -0,0 +1,87 @@
+"""
+Planos de execução da listagem de carros: cada chave de ?sort= com o filtro
+ativo=true precisa ler um índice composto já na ordem do cursor, sem ordenar
+as linhas à parte, tanto na primeira página quanto nas páginas com cursor.
+Roda o SQL gerado pela própria rota com EXPLAIN (SQLite e PostgreSQL).
+"""
+
+import pytest
+from sqlalchemy import event
+
+import backend_app as backend
+
+
+INDICE_POR_ORDENACAO = {
+    'recentes': 'ix_carros_ativo_data_criacao_id',
+    'preco_asc': 'ix_carros_ativo_preco',
+    'preco_desc': 'ix_carros_ativo_preco',
+    'ano_asc': 'ix_carros_ativo_ano',
+    'ano_desc': 'ix_carros_ativo_ano',
+    'km_asc': 'ix_carros_ativo_km_id',
+    'km_desc': 'ix_carros_ativo_km_id',
+    'marca_asc': 'ix_carros_ativo_marca_id',
+    'marca_desc': 'ix_carros_ativo_marca_id',
+}
+
+
+@pytest.fixture
+def engine():
+    with backend.app.app_context():
+        engine = backend.db.engine
+    if engine.dialect.name not in ('sqlite', 'postgresql'):
+        pytest.skip(f'EXPLAIN não verificado para {engine.dialect.name}')
+    return engine
+
+
+def consultas_da_listagem(engine, cliente, cabecalhos, url):
+    """SQL e parâmetros do SELECT paginado executado pela rota."""
+    capturadas = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM carros' in statement and 'ORDER BY' in statement:
+            capturadas.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capturar)
+    try:
+        resposta = cliente.get(url, headers=cabecalhos)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capturar)
+    assert resposta.status_code == 200
+    assert capturadas, f'nenhuma consulta paginada em {url}'
+    return resposta.get_json(), capturadas
+
+
+def plano(engine, statement, parameters):
+    with engine.begin() as conexao:
+        if engine.dialect.name == 'sqlite':
+            linhas = conexao.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            return [linha[-1] for linha in linhas]
+        # Com poucas linhas o PostgreSQL prefere ler a tabela inteira
+        conexao.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        return [linha[0] for linha in conexao.exec_driver_sql(f'EXPLAIN {statement}', parameters)]
+
+
+def verificar_plano(engine, statement, parameters, indice):
+    linhas = plano(engine, statement, parameters)
+    texto = '\n'.join(linhas)
+    assert indice in texto, texto
+    if engine.dialect.name == 'sqlite':
+        assert 'USE TEMP B-TREE FOR ORDER BY' not in texto, texto
+
+
+@pytest.mark.parametrize('ordenacao', sorted(backend.ORDENACOES))
+def test_ordenacao_usa_indice(cliente, cabecalhos, engine, ordenacao):
+    assert set(INDICE_POR_ORDENACAO) == set(backend.ORDENACOES)
+    indice = INDICE_POR_ORDENACAO[ordenacao]
+    url = f'/api/carros?ativo=true&sort={ordenacao}&limit=5'
+    backend.versao_carros.incrementar()  # sem o cache de respostas
+
+    pagina, consultas = consultas_da_listagem(engine, cliente, cabecalhos, url)
+    for statement, parameters in consultas:
+        verificar_plano(engine, statement, parameters, indice)
+
+    assert pagina['proximo_cursor']
+    _, consultas = consultas_da_listagem(
+        engine, cliente, cabecalhos, f"{url}&cursor={pagina['proximo_cursor']}")
+    for statement, parameters in consultas:
+        verificar_plano(engine, statement, parameters, indice)
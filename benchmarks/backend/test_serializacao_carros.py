@@ -0,0 +1,32 @@
+"""
+Linhas/s da serialização de carros: objetos do ORM + to_dict + json padrão
+do Flask (antes) contra with_entities + serializar_linhas + provedor JSON do
+app (depois, orjson se instalado).
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+import backend_app as backend
+
+
+def test_carros_serializacao(medir, tamanho):
+    app, db, Carro = backend.app, backend.db, backend.Carro
+    campos = list(backend.CAMPOS_CARRO)
+
+    def objetos():
+        db.session.expunge_all()
+        return [carro.to_dict() for carro in Carro.query.order_by(Carro.id).all()]
+
+    def tuplas():
+        colunas = [getattr(Carro, campo) for campo in campos]
+        return backend.serializar_linhas(Carro.query.with_entities(*colunas).order_by(Carro.id).all(), campos)
+
+    with app.app_context():
+        assert objetos() == tuplas()
+
+        padrao = DefaultJSONProvider(app)
+        medir('carros [to_dict + json padrao]', lambda: padrao.dumps(objetos()),
+              tamanho=tamanho, repeticoes=5, linhas=tamanho)
+        medir('carros [with_entities + app.json]', lambda: app.json.dumps(tuplas()),
+              tamanho=tamanho, repeticoes=5, linhas=tamanho)
+        db.session.remove()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Compara dois arquivos de resultados das suítes de benchmark.
+
+Uso:
+    python benchmarks/comparar.py antes.json depois.json
+    python benchmarks/comparar.py antes.json depois.json --limiar 15 --metrica p95_ms
+    python benchmarks/comparar.py antes.json depois.json --metrica linhas_por_s
+
+Sai com código 1 se alguma medição piorou mais que --limiar por cento
+(nas métricas *_por_s, piorar é diminuir).
+"""
+
+import argparse
+import json
+import sys
+
+
+def carregar(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    return {(r['suite'], r['nome'], r['tamanho']): r for r in dados['resultados']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('antes')
+    parser.add_argument('depois')
+    parser.add_argument('--metrica', default='p50_ms',
+                        choices=['p50_ms', 'p95_ms', 'media_ms', 'ops_por_s', 'linhas_por_s'])
+    parser.add_argument('--limiar', type=float, default=10.0, help='piora máxima aceita, em %%')
+    args = parser.parse_args()
+
+    antes = carregar(args.antes)
+    depois = carregar(args.depois)
+
+    regressoes = 0
+    print(f"{'suite':<8} {'medição':<48} {'tamanho':>9} {'antes':>10} {'depois':>10} {'variação':>9}")
+    maior_melhor = args.metrica.endswith('_por_s')
+    for chave in sorted(set(antes) & set(depois), key=lambda c: (c[0], c[1], c[2] or 0)):
+        valor_antes = antes[chave].get(args.metrica)
+        valor_depois = depois[chave].get(args.metrica)
+        if valor_antes is None or valor_depois is None:
+            continue
+        variacao = (valor_depois - valor_antes) / valor_antes * 100 if valor_antes else 0.0
+        piora = -variacao if maior_melhor else variacao
+        marca = ''
+        if piora > args.limiar:
+            regressoes += 1
+            marca = '  <-- piorou'
+        suite, nome, tamanho = chave
+        print(f"{suite:<8} {nome:<48} {tamanho or '-':>9} {valor_antes:>10.3f} "
+              f"{valor_depois:>10.3f} {variacao:>+8.1f}%{marca}")
+
+    for chave in sorted(set(antes) ^ set(depois), key=str):
+        print(f"só em {'antes' if chave in antes else 'depois'}: {chave}")
+
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
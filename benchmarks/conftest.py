@@ -0,0 +1,88 @@
+"""
+Infraestrutura comum das suítes de benchmark (pytest + test client do Flask).
+
+    python -m pytest benchmarks                 # as duas suítes
+    python -m pytest benchmarks/backend         # API de carros (backend/app.py)
+    python -m pytest benchmarks/frota           # rastreamento (pacote app/)
+
+Variáveis de ambiente:
+    BENCH_TAMANHOS      tamanhos de dataset, ex: 1000,100000,1000000 (padrão 1000)
+    BENCH_REPETICOES    repetições por medição (padrão 20)
+    BENCH_DATABASE_URL  banco da suíte de carros (padrão: SQLite temporário)
+    BENCH_FROTA_DATABASE_URL  banco da suíte de rastreamento (padrão: SQLite temporário)
+    BENCH_SAIDA         arquivo JSON de resultados (padrão benchmarks/resultados/<data>.json)
+
+Use um banco dedicado: as suítes apagam e recriam as tabelas a cada tamanho.
+Compare duas execuções com benchmarks/comparar.py. Os test_orcamento_*.py
+não medem tempo: falham quando uma rota passa do número de consultas SQL
+previsto ou repete o mesmo comando (N+1).
+"""
+
+import json
+import os
+import platform
+from datetime import datetime
+
+import sys
+
+import pytest
+
+from medicao import REPETICOES, Medidor, resultados
+
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Os benchmarks repetem login e CRUD muito além dos limites de taxa (comum/limites.py)
+os.environ.setdefault('LIMITES_HABILITADOS', 'false')
+
+# comum/ fica na raiz; no fim do path para não esconder o backend/app.py
+sys.path.append(os.path.dirname(DIRETORIO))
+from comum.orcamento_sql import contar_consultas as _contar_consultas  # noqa: E402
+
+
+@pytest.fixture
+def medir(request):
+    return Medidor(request)
+
+
+@pytest.fixture
+def contar_consultas():
+    """
+    Context manager que conta as consultas de um engine:
+
+        with contar_consultas(db.engine) as consultas:
+            cliente.get('/rota')
+        assert consultas.total <= 3, consultas.resumo()
+    """
+    return _contar_consultas
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not resultados:
+        return
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f"{'suite':<8} {'medição':<48} {'tamanho':>9} {'p50 ms':>10} {'p95 ms':>10} "
+                                f"{'ops/s':>9} {'linhas/s':>10}")
+    for r in resultados:
+        terminalreporter.write_line(
+            f"{r['suite']:<8} {r['nome']:<48} {r['tamanho'] or '-':>9} "
+            f"{r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['ops_por_s'] or 0:>9.1f} "
+            f"{r.get('linhas_por_s') or '-':>10}"
+        )
+
+
+def pytest_sessionfinish(session):
+    if not resultados:
+        return
+    saida = os.getenv('BENCH_SAIDA') or os.path.join(
+        DIRETORIO, 'resultados', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'repeticoes': REPETICOES,
+            'resultados': resultados,
+        }, arquivo, indent=2, ensure_ascii=False)
+    print(f'\nResultados gravados em {saida}')
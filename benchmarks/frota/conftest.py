@@ -0,0 +1,77 @@
+"""
+Fixtures da suíte do rastreamento (pacote app/, com Flask-Login).
+"""
+
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+from medicao import TAMANHOS
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = os.getenv('BENCH_FROTA_DATABASE_URL') or \
+    'sqlite:///' + os.path.join(tempfile.gettempdir(), 'bench_frota.db')
+
+sys.path.insert(0, RAIZ)
+
+from app import app, db  # noqa: E402
+from app.models import Localizacao, Usuario, Veiculo  # noqa: E402
+from app.espacial import indice_posicoes  # noqa: E402
+from app.ingestao import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX  # noqa: E402
+
+# Gerador de dados do backend/seed.py, carregado pelo caminho (sem importar o backend)
+_spec = importlib.util.spec_from_file_location('seed', os.path.join(RAIZ, 'backend', 'seed.py'))
+seed = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(seed)
+
+app.config['WTF_CSRF_ENABLED'] = False
+
+EMAIL = 'bench@teste.com'
+SENHA = 'senha-bench'
+
+
+def popular(tamanho):
+    """
+    Recria as tabelas com `tamanho` localizações geradas por backend/seed.py,
+    distribuídas entre tamanho // 1000 veículos (mínimo 10).
+    """
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+    usuario = Usuario(nome='Bench', email=EMAIL)
+    usuario.set_password(SENHA)
+    db.session.add(usuario)
+
+    veiculos = max(10, tamanho // 1000)
+    db.session.execute(Veiculo.__table__.insert(), [
+        {'placa': f'BEN{i:05d}', 'modelo': 'Bench', 'cor': None} for i in range(1, veiculos + 1)
+    ])
+    ids = [v.id for v in Veiculo.query.all()]
+
+    seed.inserir_em_lotes(db.session, Localizacao.__table__,
+                          seed.gerar_localizacoes(tamanho, ids, random.Random(42)))
+    db.session.commit()
+
+    indice_posicoes.invalidar()
+    db.session.remove()
+
+
+@pytest.fixture(scope='session', params=TAMANHOS, ids=lambda t: f'{t}localizacoes')
+def tamanho(request):
+    with app.app_context():
+        popular(request.param)
+    return request.param
+
+
+@pytest.fixture
+def cliente(tamanho):
+    cliente = app.test_client()
+    cliente.post('/', data={'email': EMAIL, 'senha': SENHA})
+    return cliente
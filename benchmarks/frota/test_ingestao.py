@@ -0,0 +1,41 @@
+import random
+import time
+
+import pytest
+
+from conftest import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, Localizacao, app, db
+from app.ingestao import fila_ingestao
+
+
+def _pontos(quantidade, sorteio):
+    return [{'veiculo_id': sorteio.randint(1, 10),
+             'latitude': sorteio.uniform(LAT_MIN, LAT_MAX),
+             'longitude': sorteio.uniform(LON_MIN, LON_MAX)} for _ in range(quantidade)]
+
+
+@pytest.fixture
+def restaurar(tamanho):
+    """Remove os pontos gravados pelo teste para não inflar o dataset dos seguintes."""
+    with app.app_context():
+        maior_id = db.session.query(db.func.max(Localizacao.id)).scalar() or 0
+    yield
+    while True:
+        m = fila_ingestao.metricas()
+        if m['gravados'] + m['rejeitados'] + m['derramados'] + m['descartados'] >= m['enfileirados']:
+            break
+        time.sleep(0.05)
+    with app.app_context():
+        Localizacao.query.filter(Localizacao.id > maior_id).delete()
+        db.session.commit()
+
+
+def test_batch_sincrono(medir, cliente, tamanho, restaurar):
+    pontos = _pontos(1000, random.Random(1))
+    medir('POST /api/localizacoes/batch?sincrono=1 [1000]',
+          lambda: cliente.post('/api/localizacoes/batch?sincrono=1', json=pontos), tamanho=tamanho)
+
+
+def test_batch_fila(medir, cliente, tamanho, restaurar):
+    pontos = _pontos(1000, random.Random(2))
+    medir('POST /api/localizacoes/batch [1000, fila]',
+          lambda: cliente.post('/api/localizacoes/batch', json=pontos), tamanho=tamanho, repeticoes=10)
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import indice_posicoes
+
+
+def test_posicoes_atuais(medir, cliente, tamanho):
+    medir('GET /api/localizacoes?modo=atual', lambda: cliente.get('/api/localizacoes?modo=atual'),
+          tamanho=tamanho)
+
+
+def test_viewport(medir, cliente, tamanho):
+    url = '/api/localizacoes?bbox=-38.56,-3.79,-38.54,-3.77'
+    medir('GET /api/localizacoes?bbox [indice]', lambda: cliente.get(url), tamanho=tamanho)
+
+    def reconstruindo():
+        indice_posicoes.invalidar()
+        return cliente.get(url)
+
+    medir('GET /api/localizacoes?bbox [recarga]', reconstruindo, tamanho=tamanho)
+
+
+def test_proximos(medir, cliente, tamanho):
+    medir('GET /api/veiculos/proximos', lambda: cliente.get('/api/veiculos/proximos?lat=-3.75&lon=-38.55&k=5'),
+          tamanho=tamanho)
+
+
+def test_historico_completo(medir, cliente, tamanho):
+    if tamanho > 100000:
+        pytest.skip('historico completo sem paginação só até 100k linhas')
+    medir('GET /api/localizacoes', lambda: cliente.get('/api/localizacoes'), tamanho=tamanho, repeticoes=5)
+
+
+def test_pagina_historico(medir, cliente, tamanho):
+    medir('GET /localizacoes/<id>', lambda: cliente.get('/localizacoes/1'), tamanho=tamanho)
+
+
+def test_trajeto(medir, cliente, tamanho):
+    medir('GET /api/veiculos/<id>/trajeto', lambda: cliente.get('/api/veiculos/1/trajeto'), tamanho=tamanho)
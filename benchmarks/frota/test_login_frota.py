@@ -0,0 +1,11 @@
+from conftest import EMAIL, SENHA, app
+
+
+def test_login(medir, tamanho):
+    def entrar():
+        # Cliente novo a cada vez: logado, o "/" nem chega a verificar a senha
+        resposta = app.test_client().post('/', data={'email': EMAIL, 'senha': SENHA})
+        assert resposta.status_code == 302, 'login não redirecionou'
+        return resposta
+
+    medir('POST / (login)', entrar, tamanho=tamanho, repeticoes=5)
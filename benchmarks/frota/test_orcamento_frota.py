@@ -0,0 +1,41 @@
+"""
+Orçamento de consultas SQL por rota do rastreamento. As páginas de
+veículos e localizações usam relacionamentos lazy, então um N+1 novo
+aparece aqui como aumento de consultas ou comando repetido.
+"""
+
+import pytest
+
+from conftest import app, db, indice_posicoes
+
+
+LEITURAS = {
+    '/veiculos': 3,
+    '/localizacoes/1': 2,
+    '/api/localizacoes?modo=atual': 1,
+    '/api/localizacoes?bbox=-38.6,-3.85,-38.5,-3.7': 1,
+    '/api/veiculos/proximos?lat=-3.75&lon=-38.55&k=5': 2,
+    '/api/veiculos/1/trajeto': 2,
+    '/api/veiculos': 1,
+    '/veiculo/1/editar': 1,
+    '/health': 0,
+}
+
+
+@pytest.fixture
+def engine():
+    with app.app_context():
+        return db.engine
+
+
+@pytest.mark.parametrize('url', sorted(LEITURAS))
+def test_orcamento_leitura(cliente, contar_consultas, engine, url):
+    cliente.get(url)  # aquece o cache de identidade
+    indice_posicoes.invalidar()  # inclui a recarga do índice espacial
+
+    with contar_consultas(engine) as consultas:
+        resposta = cliente.get(url)
+
+    assert resposta.status_code == 200
+    assert consultas.total <= LEITURAS[url], consultas.resumo()
+    assert not consultas.repetidos(), consultas.resumo()
@@ -0,0 +1,50 @@
+"""
+Linhas/s da serialização do histórico de localizações: objetos do ORM +
+to_dict + json padrão do Flask (antes) contra tuplas de with_entities com o
+timestamp formatado pelo banco + provedor JSON do app (depois, orjson se
+instalado). Compare com: comparar.py antes.json depois.json --metrica linhas_por_s
+"""
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from conftest import app, db
+from app.models import Localizacao
+from comum.json_rapido import linhas_como_dicts
+
+
+def _objetos():
+    db.session.expunge_all()  # sem o identity map, como num request novo
+    return [loc.to_dict() for loc in Localizacao.query.all()]
+
+
+def _tuplas():
+    return linhas_como_dicts(Localizacao.query.with_entities(*Localizacao.colunas_json()).all())
+
+
+@pytest.fixture
+def contexto(tamanho):
+    if tamanho > 100000:
+        pytest.skip('historico completo sem paginação só até 100k linhas')
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+def test_historico_serializacao(medir, contexto, tamanho):
+    assert _objetos() == _tuplas()
+
+    padrao = DefaultJSONProvider(app)
+    medir('historico [to_dict + json padrao]', lambda: padrao.dumps(_objetos()),
+          tamanho=tamanho, repeticoes=5, linhas=tamanho)
+    medir('historico [with_entities + app.json]', lambda: app.json.dumps(_tuplas()),
+          tamanho=tamanho, repeticoes=5, linhas=tamanho)
+
+
+def test_historico_so_codificacao(medir, contexto, tamanho):
+    localizacoes = _tuplas()
+    padrao = DefaultJSONProvider(app)
+    medir('historico [codificacao json padrao]', lambda: padrao.dumps(localizacoes),
+          tamanho=tamanho, repeticoes=5, linhas=tamanho)
+    medir('historico [codificacao app.json]', lambda: app.json.dumps(localizacoes),
+          tamanho=tamanho, repeticoes=5, linhas=tamanho)
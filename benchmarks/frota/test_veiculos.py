@@ -0,0 +1,6 @@
+def test_listar_veiculos(medir, cliente, tamanho):
+    medir('GET /veiculos', lambda: cliente.get('/veiculos'), tamanho=tamanho)
+
+
+def test_api_veiculos(medir, cliente, tamanho):
+    medir('GET /api/veiculos', lambda: cliente.get('/api/veiculos'), tamanho=tamanho)
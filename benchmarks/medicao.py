@@ -0,0 +1,66 @@
+"""
+Medição de latência usada pelas suítes de benchmark (ver conftest.py).
+"""
+
+
+import os
+import statistics
+import time
+
+
+TAMANHOS = [int(t) for t in os.getenv('BENCH_TAMANHOS', '1000').split(',') if t.strip()]
+REPETICOES = int(os.getenv('BENCH_REPETICOES', 20))
+
+resultados = []
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+class Medidor:
+    """
+    Chama `funcao` algumas vezes e registra as latências. Se a função
+    devolver uma resposta do test client, status >= 400 falha o teste.
+    Com `linhas` (linhas processadas por chamada) registra também linhas_por_s.
+    """
+
+    def __init__(self, request):
+        self.suite = os.path.basename(os.path.dirname(str(request.node.fspath)))
+        self.teste = request.node.originalname
+
+    def __call__(self, nome, funcao, tamanho=None, repeticoes=None, aquecimento=1, linhas=None):
+        repeticoes = repeticoes or REPETICOES
+        for _ in range(aquecimento):
+            self._verificar(funcao())
+
+        latencias = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resposta = funcao()
+            latencias.append(time.perf_counter() - inicio)
+            self._verificar(resposta)
+
+        resultado = {
+            'suite': self.suite,
+            'teste': self.teste,
+            'nome': nome,
+            'tamanho': tamanho,
+            'repeticoes': repeticoes,
+            'media_ms': round(statistics.mean(latencias) * 1000, 3),
+            'p50_ms': round(percentil(latencias, 0.50) * 1000, 3),
+            'p95_ms': round(percentil(latencias, 0.95) * 1000, 3),
+            'min_ms': round(min(latencias) * 1000, 3),
+            'max_ms': round(max(latencias) * 1000, 3),
+            'ops_por_s': round(repeticoes / sum(latencias), 1) if sum(latencias) else None,
+        }
+        if linhas is not None:
+            resultado['linhas_por_s'] = round(linhas * repeticoes / sum(latencias)) if sum(latencias) else None
+        resultados.append(resultado)
+        return resultado
+
+    @staticmethod
+    def _verificar(resposta):
+        status = getattr(resposta, 'status_code', None)
+        assert status is None or status < 400, f'status {status}: {resposta.get_data(as_text=True)[:200]}'
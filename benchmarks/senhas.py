@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Mede quantas verificações de senha (o custo dominante do /login) cada
+núcleo consegue fazer por segundo para diferentes políticas de hash.
+
+Uso:
+    python benchmarks/senhas.py
+    python benchmarks/senhas.py --metodos pbkdf2:sha256:600000 scrypt:16384:8:1 --segundos 5
+    python benchmarks/senhas.py --processos 4 --json resultados.json
+
+Escolha o método mais caro cujo p95 ainda cabe no SLO de latência do login
+e configure-o em SENHA_HASH_METODO.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comum.senhas import gerar_hash, verificar_senha
+
+
+METODOS_PADRAO = [
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:100000',
+    'scrypt:32768:8:1',
+    'scrypt:16384:8:1',
+]
+
+
+def medir(args):
+    """Verifica a mesma senha em laço por `segundos`; roda em um processo."""
+    metodo, segundos = args
+    hash_armazenado = gerar_hash('senha-de-teste', metodo)
+    latencias = []
+    fim = time.perf_counter() + segundos
+
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        verificar_senha(hash_armazenado, 'senha-de-teste')
+        latencias.append(time.perf_counter() - inicio)
+
+    return latencias
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--metodos', nargs='+', default=METODOS_PADRAO)
+    parser.add_argument('--segundos', type=float, default=3.0, help='duração por método e processo')
+    parser.add_argument('--processos', type=int, default=1, help='processos em paralelo (1 por núcleo)')
+    parser.add_argument('--json', help='arquivo para gravar os resultados')
+    args = parser.parse_args()
+
+    resultados = []
+    print(f"{'método':<24} {'logins/s/núcleo':>16} {'total/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for metodo in args.metodos:
+        with Pool(args.processos) as pool:
+            por_processo = pool.map(medir, [(metodo, args.segundos)] * args.processos)
+
+        latencias = [x for lista in por_processo for x in lista]
+        total_por_segundo = len(latencias) / args.segundos
+        resultado = {
+            'metodo': metodo,
+            'processos': args.processos,
+            'logins_por_segundo_por_nucleo': round(total_por_segundo / args.processos, 1),
+            'logins_por_segundo_total': round(total_por_segundo, 1),
+            'p50_ms': round(statistics.median(latencias) * 1000, 2),
+            'p95_ms': round(percentil(latencias, 0.95) * 1000, 2),
+        }
+        resultados.append(resultado)
+        print(f"{metodo:<24} {resultado['logins_por_segundo_por_nucleo']:>16} "
+              f"{resultado['logins_por_segundo_total']:>10} {resultado['p50_ms']:>8} {resultado['p95_ms']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
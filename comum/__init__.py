@@ -0,0 +1,4 @@
+"""
+Código compartilhado pelas duas aplicações Flask do repositório: o sistema
+de rastreamento (app/) e a API de carros usada pelo frontend Vue (backend/).
+"""
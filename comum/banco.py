@@ -0,0 +1,69 @@
+"""
+Configuração do pool de conexões do SQLAlchemy a partir de variáveis de
+ambiente (arquivos .env.*).
+
+Regra de dimensionamento: cada processo (worker) tem o seu pool. Use
+DB_POOL_SIZE igual ao número de threads por worker (waitress: threads,
+padrão 4; gunicorn: --threads), DB_MAX_OVERFLOW pequeno para picos, e
+confira que workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) fica abaixo do
+max_connections do PostgreSQL (padrão 100) descontadas as conexões
+reservadas para administração e migrations.
+"""
+
+import os
+
+
+def _inteiro(nome, padrao):
+    return int(os.getenv(nome, padrao))
+
+
+def _booleano(nome, padrao):
+    return os.getenv(nome, str(padrao)).strip().lower() in ('1', 'true', 'sim', 'yes')
+
+
+def opcoes_engine(url):
+    """
+    Monta o SQLALCHEMY_ENGINE_OPTIONS para a URL do banco.
+
+    Variáveis: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE (segundos), DB_POOL_PRE_PING e DB_STATEMENT_TIMEOUT_MS
+    (0 desliga). No SQLite só o pre_ping se aplica, pois ele não usa o
+    QueuePool.
+    """
+    opcoes = {'pool_pre_ping': _booleano('DB_POOL_PRE_PING', True)}
+
+    if url.startswith('sqlite'):
+        return opcoes
+
+    opcoes.update({
+        'pool_size': _inteiro('DB_POOL_SIZE', 5),
+        'max_overflow': _inteiro('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _inteiro('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _inteiro('DB_POOL_RECYCLE', 1800),
+    })
+
+    timeout_ms = _inteiro('DB_STATEMENT_TIMEOUT_MS', 0)
+    if timeout_ms and url.startswith('postgresql'):
+        opcoes['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+
+    return opcoes
+
+
+def metricas_pool(engine):
+    """Estado do pool deste processo, para o /health."""
+    pool = engine.pool
+    metricas = {
+        'pid': os.getpid(),
+        'tipo': type(pool).__name__,
+    }
+
+    # Só o QueuePool expõe os contadores
+    if hasattr(pool, 'checkedout'):
+        metricas.update({
+            'tamanho': pool.size(),
+            'em_uso': pool.checkedout(),
+            'livres': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+
+    return metricas
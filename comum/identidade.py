@@ -0,0 +1,84 @@
+"""
+Cache de identidade dos usuários logados (Flask-Login e JWT).
+
+Guarda os valores das colunas do usuário por id, com TTL e limite de
+tamanho (LRU). No acerto, o objeto é reconstruído e anexado à sessão do
+request com merge(load=False), sem ir ao banco. Colunas sensíveis (o hash
+da senha) não entram no cache; ficam não carregadas no objeto e, se
+alguém as ler, vêm do banco nessa hora. As entradas são
+invalidadas após o commit de qualquer alteração ou remoção do usuário.
+Cada processo tem o seu cache; o TTL limita o quanto um worker pode ficar
+desatualizado em relação a escritas feitas em outro.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+
+class CacheIdentidade:
+
+    def __init__(self, ttl=60, max_itens=1024, colunas_sensiveis=()):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.colunas_sensiveis = set(colunas_sensiveis)
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valores = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valores
+
+    def guardar(self, chave, valores):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valores)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def carregar(self, db, modelo, usuario_id):
+        """Retorna a instância do usuário na sessão atual, do cache ou do banco."""
+        valores = self.obter(usuario_id)
+        if valores is not None:
+            usuario = modelo(**valores)
+            make_transient_to_detached(usuario)
+            return db.session.merge(usuario, load=False)
+
+        usuario = db.session.get(modelo, usuario_id)
+        if usuario is not None:
+            colunas = [c.key for c in inspect(modelo).column_attrs if c.key not in self.colunas_sensiveis]
+            self.guardar(usuario_id, {coluna: getattr(usuario, coluna) for coluna in colunas})
+        return usuario
+
+    def monitorar(self, modelo):
+        """Invalida a entrada de um usuário após o commit que o altera ou remove."""
+        chave_sessao = f'identidades_alteradas_{modelo.__name__}'
+
+        @event.listens_for(modelo, 'after_update')
+        @event.listens_for(modelo, 'after_delete')
+        def marcar(mapper, connection, usuario):
+            object_session(usuario).info.setdefault(chave_sessao, set()).add(usuario.id)
+
+        @event.listens_for(Session, 'after_commit')
+        def invalidar_alterados(session):
+            for usuario_id in session.info.pop(chave_sessao, ()):
+                self.invalidar(usuario_id)
+
+        @event.listens_for(Session, 'after_rollback')
+        def descartar(session):
+            session.info.pop(chave_sessao, None)
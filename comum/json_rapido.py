@@ -0,0 +1,104 @@
+"""
+Serialização JSON rápida para respostas com muitas linhas.
+
+ProvedorJSONRapido troca o json da biblioteca padrão pelo orjson no
+jsonify/app.json (quando o pacote está instalado e JSON_RAPIDO não é
+false), mantendo o comportamento do provedor do Flask: chaves ordenadas,
+datas no formato HTTP e Decimal/UUID pelo mesmo default. A diferença
+visível é que caracteres não ASCII saem em UTF-8 em vez de \\uXXXX.
+
+Para listas grandes, o caminho por tuplas evita montar objetos do ORM e
+chamar to_dict linha a linha: a consulta seleciona só as colunas com
+with_entities (datas já formatadas pelo banco com data_em_texto) e
+linhas_como_dicts monta os dicionários direto das tuplas.
+"""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import String, cast, func
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+
+class ProvedorJSONRapido(DefaultJSONProvider):
+    """
+    Usa o orjson quando possível e o provedor padrão quando a chamada traz
+    argumentos do json.dumps (indent, separators...) ou valores que o orjson
+    não serializa (inteiros acima de 64 bits).
+    """
+
+    def _codificar(self, obj, indentar=False):
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opcoes |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=opcoes)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._codificar(obj).decode()
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            corpo = self._codificar(obj, indentar)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(corpo + b"\n", mimetype=self.mimetype)
+
+
+def instalar(app):
+    """Usa o ProvedorJSONRapido no app se o orjson estiver disponível. Retorna se instalou."""
+    if orjson is None or os.getenv("JSON_RAPIDO", "true").lower() != "true":
+        return False
+    app.json = ProvedorJSONRapido(app)
+    return True
+
+
+def dumps_compacto(obj):
+    """JSON sem espaços, fora do contexto do Flask (ex: eventos SSE)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def data_em_texto(coluna, dialeto):
+    """
+    Expressão SQL que devolve a data como "AAAA-MM-DD HH:MM:SS" (o strftime
+    dos to_dict), formatada pelo banco para todas as linhas da consulta.
+    """
+    if dialeto == "postgresql":
+        return func.to_char(coluna, "YYYY-MM-DD HH24:MI:SS")
+    if dialeto == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%S", coluna)
+    if dialeto in ("mysql", "mariadb"):
+        return func.date_format(coluna, "%Y-%m-%d %H:%i:%s")
+    # Outros bancos: texto nativo da data, que pode trazer frações de segundo
+    return cast(coluna, String)
+
+
+def linhas_como_dicts(linhas):
+    """Linhas de with_entities -> dicionários com os nomes (labels) das colunas."""
+    if not linhas:
+        return []
+    chaves = linhas[0]._fields
+    return [dict(zip(chaves, linha)) for linha in linhas]
@@ -0,0 +1,156 @@
+"""
+Limite de taxa por IP/usuário e descarte de carga por concorrência.
+
+Limites de taxa (Flask-Limiter): as rotas marcadas com limites.por_ip() ou
+limites.por_usuario() contam requisições numa janela e respondem 429 com
+Retry-After ao estourar. Os valores vêm de LIMITE_<NOME> no formato do
+Flask-Limiter ("10 per minute", "5/second;100/hour"). O armazenamento é a
+memória do processo por padrão (cada worker conta o seu) ou o Redis de
+LIMITES_STORAGE_URI/REDIS_URL, compartilhado entre workers. Sem o pacote
+flask_limiter os decorators não fazem nada.
+
+Descarte de carga (DescarteCarga): conta as requisições em andamento no
+processo e responde 503 com Retry-After quando passam do máximo. As rotas
+de autenticação (hash de senha caro) têm um teto próprio e não entram no
+geral, então uma enxurrada de logins não ocupa as threads da API.
+"""
+
+import os
+import threading
+
+from flask import g, jsonify, request
+
+try:
+    from flask_limiter import Limiter
+except ImportError:  # flask_limiter é opcional
+    Limiter = None
+
+
+LIMITES_PADRAO = {
+    "login": "10 per minute",
+    "cadastro": "5 per minute",
+    "leitura": "300 per minute",
+    "escrita": "60 per minute",
+}
+
+# Endpoints que nunca são descartados (monitoramento e arquivos estáticos)
+ENDPOINTS_ISENTOS = {"health", "metricas", "static"}
+
+
+def ip_cliente():
+    # Atrás de proxy, configure o ProxyFix para remote_addr ser o IP real
+    return request.remote_addr or "desconhecido"
+
+
+def _sem_limite(view):
+    return view
+
+
+class Limites:
+    """
+    `chave_usuario` devolve o id do usuário autenticado (ou None) e é usada
+    por por_usuario(); sem usuário a contagem cai no IP.
+    """
+
+    def __init__(self, app, chave_usuario=None, prefixo="app"):
+        self.chave_usuario = chave_usuario
+        self.limiter = None
+
+        if os.getenv("LIMITES_HABILITADOS", "true").lower() != "true":
+            return
+        if Limiter is None:
+            print("Flask-Limiter não está instalado; limites de taxa desligados")
+            return
+
+        uri = os.getenv("LIMITES_STORAGE_URI") or os.getenv("REDIS_URL") or "memory://"
+        opcoes = dict(
+            app=app,
+            key_prefix=prefixo,
+            strategy=os.getenv("LIMITES_ESTRATEGIA", "fixed-window"),
+            headers_enabled=True,
+            # Redis fora do ar: segue contando em memória em vez de derrubar as rotas
+            swallow_errors=True,
+            in_memory_fallback_enabled=True,
+        )
+        try:
+            self.limiter = Limiter(ip_cliente, storage_uri=uri, **opcoes)
+        except Exception as e:
+            print(f"Erro ao configurar armazenamento dos limites ({uri}); usando memória: {str(e)}")
+            self.limiter = Limiter(ip_cliente, storage_uri="memory://", **opcoes)
+
+    def valor(self, nome):
+        return os.getenv(f"LIMITE_{nome.upper()}", LIMITES_PADRAO[nome])
+
+    def por_ip(self, nome, metodos=None):
+        if self.limiter is None:
+            return _sem_limite
+        return self.limiter.limit(self.valor(nome), key_func=ip_cliente, methods=metodos,
+                                  scope=nome)
+
+    def por_usuario(self, nome, metodos=None):
+        if self.limiter is None:
+            return _sem_limite
+        return self.limiter.limit(self.valor(nome), key_func=self._chave_usuario, methods=metodos,
+                                  scope=nome)
+
+    def _chave_usuario(self):
+        usuario = self.chave_usuario() if self.chave_usuario else None
+        return f"usuario:{usuario}" if usuario else f"ip:{ip_cliente()}"
+
+
+class DescarteCarga:
+    """
+    Tetos de requisições simultâneas por processo: CARGA_MAX_SIMULTANEOS
+    para as rotas em geral e CARGA_MAX_AUTENTICACAO para os endpoints de
+    `autenticacao`. 0 desliga o teto correspondente.
+    """
+
+    def __init__(self, app, autenticacao=(), isentos=ENDPOINTS_ISENTOS):
+        self.autenticacao = set(autenticacao)
+        self.isentos = set(isentos)
+        self.retry_after = os.getenv("CARGA_RETRY_AFTER", "1")
+        self.maximos = {
+            "geral": int(os.getenv("CARGA_MAX_SIMULTANEOS", 0)),
+            "autenticacao": int(os.getenv("CARGA_MAX_AUTENTICACAO", 0)),
+        }
+        self._em_andamento = {grupo: 0 for grupo in self.maximos}
+        self._descartadas = {grupo: 0 for grupo in self.maximos}
+        self._lock = threading.Lock()
+
+        if any(self.maximos.values()):
+            app.before_request(self._entrar)
+            app.teardown_request(self._sair)
+
+    def _entrar(self):
+        if request.endpoint in self.isentos:
+            return None
+
+        grupo = "autenticacao" if request.endpoint in self.autenticacao else "geral"
+        maximo = self.maximos[grupo]
+        if not maximo:
+            return None
+
+        with self._lock:
+            if self._em_andamento[grupo] >= maximo:
+                self._descartadas[grupo] += 1
+                resposta = jsonify({"message": "Servidor sobrecarregado, tente novamente"})
+                resposta.status_code = 503
+                resposta.headers["Retry-After"] = self.retry_after
+                return resposta
+            self._em_andamento[grupo] += 1
+        g.carga_grupo = grupo
+        return None
+
+    def _sair(self, erro=None):
+        grupo = g.pop("carga_grupo", None)
+        if grupo is not None:
+            with self._lock:
+                self._em_andamento[grupo] -= 1
+
+    def metricas(self):
+        with self._lock:
+            medidas = {}
+            for grupo in self.maximos:
+                medidas[f"carga_em_andamento_{grupo}"] = self._em_andamento[grupo]
+                medidas[f"carga_descartadas_{grupo}"] = self._descartadas[grupo]
+            return medidas
@@ -0,0 +1,205 @@
+"""
+Instrumentação de requisições e exportação no formato do Prometheus.
+
+Para cada endpoint (regra da URL, não o caminho, para não explodir a
+cardinalidade) são medidos: histograma de latência, requisições por
+status, e quantidade e tempo das consultas SQL feitas durante o request
+(eventos before/after_cursor_execute do SQLAlchemy). Requisições acima de
+REQUISICAO_LENTA_MS são registradas no log junto com as consultas mais
+demoradas.
+
+As métricas são por processo: com vários workers, cada um expõe as suas
+em /metrics e o Prometheus deve coletar de todos (ou use um único worker
+com várias threads).
+
+/metrics exige "Authorization: Bearer <METRICAS_TOKEN>" quando o token está
+definido. Com METRICAS_TOKEN_OBRIGATORIO=true (produção) e sem token o
+endpoint fica fechado em vez de aberto.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+
+# Limites dos buckets de latência, em segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Consultas guardadas por request para o log de requisições lentas
+MAX_CONSULTAS_LOG = 50
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(**rotulos):
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos.items()) + '}'
+
+
+class Metricas:
+
+    def __init__(self, app, db, prefixo='app', lento_ms=None, token=None):
+        self.app = app
+        self.prefixo = prefixo
+        self.lento_s = (lento_ms if lento_ms is not None
+                        else int(os.getenv('REQUISICAO_LENTA_MS', 500))) / 1000
+        self.token = token if token is not None else os.getenv('METRICAS_TOKEN')
+        self.token_obrigatorio = os.getenv('METRICAS_TOKEN_OBRIGATORIO', 'false').lower() == 'true'
+        if self.token_obrigatorio and not self.token:
+            print('METRICAS_TOKEN_OBRIGATORIO=true sem METRICAS_TOKEN: /metrics responde 403')
+        self._lock = threading.Lock()
+        self._latencias = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+        self._soma_latencia = defaultdict(float)
+        self._requisicoes = defaultdict(int)
+        self._sql_consultas = defaultdict(int)
+        self._sql_tempo = defaultdict(float)
+        self._coletores = []
+
+        app.before_request(self._iniciar)
+        app.after_request(self._finalizar)
+        app.add_url_rule('/metrics', 'metricas', self.exportar)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._antes_sql)
+            event.listen(db.engine, 'after_cursor_execute', self._depois_sql)
+            event.listen(db.engine, 'handle_error', self._erro_sql)
+
+    def coletor(self, funcao):
+        """
+        Registra uma função que devolve {nome: valor} com medidas do momento
+        (ex: conexões do pool em uso), exportadas como gauges.
+        """
+        self._coletores.append(funcao)
+        return funcao
+
+    # ---- eventos ----
+
+    def _iniciar(self):
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_sql = []
+        g.metricas_sql_tempo = 0.0
+        g.metricas_sql_qtd = 0
+
+    # O início fica no contexto de execução de cada comando: um comando que
+    # falha não chega ao after_cursor_execute e não desalinha os seguintes
+
+    def _antes_sql(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metricas_inicio_sql = time.perf_counter()
+
+    def _depois_sql(self, conn, cursor, statement, parameters, context, executemany):
+        self._contar_sql(context, statement)
+
+    def _erro_sql(self, contexto_erro):
+        # Comando que falhou no banco (timeout, violação de constraint) também conta
+        self._contar_sql(contexto_erro.execution_context, contexto_erro.statement)
+
+    def _contar_sql(self, context, statement):
+        inicio = getattr(context, 'metricas_inicio_sql', None)
+        if inicio is None:
+            return
+        del context.metricas_inicio_sql
+        duracao = time.perf_counter() - inicio
+        # Threads de fundo (broker, fila de ingestão) não têm request
+        if not has_request_context() or 'metricas_sql' not in g:
+            return
+        g.metricas_sql_qtd += 1
+        g.metricas_sql_tempo += duracao
+        if len(g.metricas_sql) < MAX_CONSULTAS_LOG:
+            g.metricas_sql.append((duracao, statement))
+
+    def _finalizar(self, resposta):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None or request.endpoint == 'metricas':
+            return resposta
+
+        duracao = time.perf_counter() - inicio
+        endpoint = request.url_rule.rule if request.url_rule else 'sem_rota'
+        chave = (request.method, endpoint)
+        sql_qtd = g.get('metricas_sql_qtd', 0)
+        sql_tempo = g.get('metricas_sql_tempo', 0.0)
+
+        with self._lock:
+            baldes = self._latencias[chave]
+            for indice, limite in enumerate(BUCKETS):
+                if duracao <= limite:
+                    baldes[indice] += 1
+                    break
+            else:
+                baldes[-1] += 1
+            self._soma_latencia[chave] += duracao
+            self._requisicoes[chave + (resposta.status_code,)] += 1
+            self._sql_consultas[chave] += sql_qtd
+            self._sql_tempo[chave] += sql_tempo
+
+        if duracao >= self.lento_s:
+            self._registrar_lenta(chave, resposta.status_code, duracao, sql_qtd, sql_tempo)
+        return resposta
+
+    def _registrar_lenta(self, chave, status, duracao, sql_qtd, sql_tempo):
+        consultas = sorted(g.get('metricas_sql', []), key=lambda c: c[0], reverse=True)[:5]
+        linhas = [f'Requisição lenta: {chave[0]} {request.full_path} ({chave[1]}) -> {status} '
+                  f'em {duracao * 1000:.0f} ms; {sql_qtd} consultas SQL em {sql_tempo * 1000:.0f} ms']
+        for tempo, comando in consultas:
+            linhas.append(f'  {tempo * 1000:8.1f} ms  {" ".join(comando.split())[:500]}')
+        self.app.logger.warning('\n'.join(linhas))
+
+    # ---- exportação ----
+
+    def exportar(self):
+        if not self.token and self.token_obrigatorio:
+            return Response('METRICAS_TOKEN não configurado\n', status=403, mimetype='text/plain')
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            return Response('Token inválido\n', status=401, mimetype='text/plain')
+        return Response(self.texto(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    def texto(self):
+        p = self.prefixo
+        linhas = []
+
+        with self._lock:
+            linhas.append(f'# HELP {p}_requisicao_segundos Latência das requisições por endpoint.')
+            linhas.append(f'# TYPE {p}_requisicao_segundos histogram')
+            for (metodo, endpoint), baldes in sorted(self._latencias.items()):
+                acumulado = 0
+                for limite, quantidade in zip(BUCKETS + ('+Inf',), baldes):
+                    acumulado += quantidade
+                    rotulos = _rotulos(metodo=metodo, endpoint=endpoint, le=limite)
+                    linhas.append(f'{p}_requisicao_segundos_bucket{rotulos} {acumulado}')
+                rotulos = _rotulos(metodo=metodo, endpoint=endpoint)
+                linhas.append(f'{p}_requisicao_segundos_sum{rotulos} {self._soma_latencia[(metodo, endpoint)]:.6f}')
+                linhas.append(f'{p}_requisicao_segundos_count{rotulos} {acumulado}')
+
+            linhas.append(f'# HELP {p}_requisicoes_total Requisições por endpoint e status.')
+            linhas.append(f'# TYPE {p}_requisicoes_total counter')
+            for (metodo, endpoint, status), quantidade in sorted(self._requisicoes.items()):
+                rotulos = _rotulos(metodo=metodo, endpoint=endpoint, status=status)
+                linhas.append(f'{p}_requisicoes_total{rotulos} {quantidade}')
+
+            linhas.append(f'# HELP {p}_sql_consultas_total Consultas SQL feitas durante as requisições.')
+            linhas.append(f'# TYPE {p}_sql_consultas_total counter')
+            for (metodo, endpoint), quantidade in sorted(self._sql_consultas.items()):
+                linhas.append(f'{p}_sql_consultas_total{_rotulos(metodo=metodo, endpoint=endpoint)} {quantidade}')
+
+            linhas.append(f'# HELP {p}_sql_segundos_total Tempo gasto em SQL durante as requisições.')
+            linhas.append(f'# TYPE {p}_sql_segundos_total counter')
+            for (metodo, endpoint), tempo in sorted(self._sql_tempo.items()):
+                linhas.append(f'{p}_sql_segundos_total{_rotulos(metodo=metodo, endpoint=endpoint)} {tempo:.6f}')
+
+        for funcao in self._coletores:
+            try:
+                medidas = funcao()
+            except Exception as e:
+                print(f'Erro ao coletar métricas: {str(e)}')
+                continue
+            for nome, valor in medidas.items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    linhas.append(f'# TYPE {p}_{nome} gauge')
+                    linhas.append(f'{p}_{nome} {valor}')
+
+        return '\n'.join(linhas) + '\n'
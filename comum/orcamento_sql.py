@@ -0,0 +1,127 @@
+"""
+Orçamento de consultas SQL por requisição, para desenvolvimento e testes.
+
+Desligado por padrão. Com SQL_ORCAMENTO > 0 cada request conta os comandos
+enviados ao banco e avisa quando:
+  - o total passa de SQL_ORCAMENTO, ou
+  - o mesmo comando (mesmo SQL, parâmetros diferentes) se repete mais de
+    SQL_REPETICOES_MAX vezes, o sinal típico de N+1 em relacionamento lazy.
+
+Com SQL_ORCAMENTO_ACAO=log o aviso vai para o log ao final do request. Com
+SQL_ORCAMENTO_ACAO=erro o comando que estoura o orçamento não é executado:
+OrcamentoExcedido é levantada antes dele, dentro da view, então o commit
+da view não acontece e a transação é desfeita. O modo erro é para testes e
+CI; a view pode capturar a exceção e responder 500.
+
+contar_consultas() faz a mesma contagem fora de requests, para os testes
+de orçamento em benchmarks/.
+"""
+
+import os
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+class OrcamentoExcedido(Exception):
+    """A requisição fez mais consultas que o orçamento configurado."""
+
+
+class ContadorConsultas:
+
+    def __init__(self):
+        self.comandos = []
+        self.excedido = False
+
+    def registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.comandos.append(" ".join(statement.split()))
+
+    @property
+    def total(self):
+        return len(self.comandos)
+
+    def repetidos(self, minimo=2):
+        """{comando: vezes} dos comandos executados pelo menos `minimo` vezes."""
+        return {comando: vezes for comando, vezes in Counter(self.comandos).items() if vezes >= minimo}
+
+    def resumo(self, limite=10):
+        linhas = [f"{self.total} consultas"]
+        for comando, vezes in Counter(self.comandos).most_common(limite):
+            linhas.append(f"  {vezes:4d}x {comando[:300]}")
+        return "\n".join(linhas)
+
+
+@contextmanager
+def contar_consultas(engine):
+    """Conta os comandos enviados pelo engine dentro do bloco with."""
+    contador = ContadorConsultas()
+    event.listen(engine, "before_cursor_execute", contador.registrar)
+    try:
+        yield contador
+    finally:
+        event.remove(engine, "before_cursor_execute", contador.registrar)
+
+
+def configurar(app):
+    """Lê as variáveis de ambiente do orçamento para o app.config."""
+    app.config.setdefault("SQL_ORCAMENTO", int(os.getenv("SQL_ORCAMENTO", 0)))
+    app.config.setdefault("SQL_REPETICOES_MAX", int(os.getenv("SQL_REPETICOES_MAX", 5)))
+    app.config.setdefault("SQL_ORCAMENTO_ACAO", os.getenv("SQL_ORCAMENTO_ACAO", "log"))
+
+
+class OrcamentoConsultas:
+
+    def __init__(self, app, db):
+        configurar(app)
+        self.app = app
+        self.ativo = app.config["SQL_ORCAMENTO"] > 0
+        if not self.ativo:
+            return
+
+        app.before_request(self._iniciar)
+        app.after_request(self._verificar)
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._registrar)
+
+    def _iniciar(self):
+        g.orcamento_sql = ContadorConsultas()
+
+    def _registrar(self, *args):
+        if not has_request_context() or "orcamento_sql" not in g:
+            return
+        contador = g.orcamento_sql
+        contador.registrar(*args)
+        if self.app.config["SQL_ORCAMENTO_ACAO"] != "erro" or contador.excedido:
+            return
+        mensagem = self._mensagem(contador)
+        if mensagem:
+            # Uma vez por request: as consultas do tratamento de erro da view seguem
+            contador.excedido = True
+            raise OrcamentoExcedido(mensagem)
+
+    def _verificar(self, resposta):
+        contador = g.pop("orcamento_sql", None)
+        if contador is None or contador.excedido:
+            return resposta
+
+        mensagem = self._mensagem(contador)
+        if mensagem:
+            self.app.logger.warning(mensagem)
+        return resposta
+
+    def _mensagem(self, contador):
+        """Descrição do estouro do orçamento, ou None se está dentro dele."""
+        config = self.app.config
+        problemas = []
+        if contador.total > config["SQL_ORCAMENTO"]:
+            problemas.append(f"{contador.total} consultas (orçamento {config['SQL_ORCAMENTO']})")
+        repetidos = contador.repetidos(config["SQL_REPETICOES_MAX"] + 1)
+        if repetidos:
+            problemas.append(f"{len(repetidos)} comando(s) repetido(s) mais de "
+                             f"{config['SQL_REPETICOES_MAX']} vezes (possível N+1)")
+        if not problemas:
+            return None
+        return (f"Orçamento SQL excedido em {request.method} {request.path}: "
+                f"{'; '.join(problemas)}\n{contador.resumo()}")
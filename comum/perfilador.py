@@ -0,0 +1,171 @@
+"""
+Perfilador por amostragem de pilha para requisições em produção.
+
+Middleware WSGI que, para as requisições escolhidas, lê a pilha da thread
+do request a cada PERFILADOR_INTERVALO_MS e grava as amostras no formato
+"folded" (uma pilha por linha, frames separados por ';' e a contagem no
+final), aceito por flamegraph.pl, speedscope e inferno. Um request é
+perfilado quando:
+  - traz o cabeçalho X-Perfilar com o valor de PERFILADOR_TOKEN, ou
+  - é sorteado pela taxa PERFILADOR_TAXA (0 a 1; 0 desliga).
+
+Limites de custo: no máximo PERFILADOR_MAX_SIMULTANEOS perfis ao mesmo
+tempo (os demais requests seguem sem perfil), cada perfil dura no máximo
+PERFILADOR_MAX_SEGUNDOS (depois disso é gravado e a vaga é liberada, mesmo
+que a resposta continue, como num stream SSE) e só os
+PERFILADOR_MAX_ARQUIVOS mais recentes ficam em PERFILADOR_DIR. Sem token e
+com taxa 0 o middleware não faz nada.
+
+Só os requests perfilados pelo token recebem o cabeçalho X-Perfil com o
+nome do arquivo; os sorteados não expõem nada ao cliente.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+
+def _formatar_frame(frame):
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+class Amostrador(threading.Thread):
+    """
+    Thread que coleta a pilha de outra thread em intervalos fixos. Ao chegar
+    em max_segundos sem ter sido parada, chama `ao_esgotar` (sem argumentos).
+    """
+
+    def __init__(self, thread_id, intervalo, max_segundos, ao_esgotar=None):
+        super().__init__(name="perfilador", daemon=True)
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.max_segundos = max_segundos
+        self.ao_esgotar = ao_esgotar
+        self.pilhas = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+
+    def run(self):
+        limite = time.monotonic() + self.max_segundos
+        while not self._parar.wait(self.intervalo):
+            if time.monotonic() >= limite:
+                if self.ao_esgotar is not None:
+                    self.ao_esgotar()
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_formatar_frame(frame))
+                frame = frame.f_back
+            self.pilhas[";".join(reversed(frames))] += 1
+            self.amostras += 1
+
+    def parar(self):
+        self._parar.set()
+        # ao_esgotar roda na própria thread do amostrador, que não pode esperar por si
+        if threading.current_thread() is not self:
+            self.join()
+
+
+class _RespostaPerfilada:
+    """Mantém o perfil aberto até o servidor terminar de consumir o corpo."""
+
+    def __init__(self, corpo, encerrar):
+        self._corpo = corpo
+        self._encerrar = encerrar
+
+    def __iter__(self):
+        return iter(self._corpo)
+
+    def close(self):
+        try:
+            if hasattr(self._corpo, "close"):
+                self._corpo.close()
+        finally:
+            self._encerrar()
+
+
+class PerfiladorAmostragem:
+
+    def __init__(self, wsgi_app, nome="app"):
+        self.wsgi_app = wsgi_app
+        self.nome = nome
+        self.token = os.getenv("PERFILADOR_TOKEN", "")
+        self.taxa = float(os.getenv("PERFILADOR_TAXA", 0))
+        self.intervalo = int(os.getenv("PERFILADOR_INTERVALO_MS", 5)) / 1000
+        self.max_segundos = float(os.getenv("PERFILADOR_MAX_SEGUNDOS", 30))
+        self.max_arquivos = int(os.getenv("PERFILADOR_MAX_ARQUIVOS", 200))
+        self.diretorio = os.getenv("PERFILADOR_DIR") or os.path.join(tempfile.gettempdir(), "perfis")
+        self._vagas = threading.BoundedSemaphore(int(os.getenv("PERFILADOR_MAX_SIMULTANEOS", 1)))
+
+    def _pelo_token(self, environ):
+        return bool(self.token) and environ.get("HTTP_X_PERFILAR") == self.token
+
+    def __call__(self, environ, start_response):
+        pelo_token = self._pelo_token(environ)
+        escolhido = pelo_token or (self.taxa > 0 and random.random() < self.taxa)
+        if not escolhido or not self._vagas.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        inicio = time.perf_counter()
+        caminho = environ.get("PATH_INFO", "/")
+        arquivo = os.path.join(self.diretorio, "{}-{}-{}-{}-{}.folded".format(
+            time.strftime("%Y%m%d-%H%M%S"), self.nome, environ.get("REQUEST_METHOD", "GET"),
+            caminho.strip("/").replace("/", "_") or "raiz", uuid.uuid4().hex[:6]))
+        encerrado = threading.Lock()
+
+        def encerrar():
+            # Chamado pelo close() da resposta, por exceção da view ou pelo
+            # amostrador ao esgotar o tempo; só a primeira chamada grava
+            if not encerrado.acquire(blocking=False):
+                return
+            try:
+                amostrador.parar()
+                self._gravar(arquivo, amostrador, environ, time.perf_counter() - inicio)
+            except Exception as e:
+                print(f"Erro ao gravar perfil: {str(e)}")
+            finally:
+                self._vagas.release()
+
+        amostrador = Amostrador(threading.get_ident(), self.intervalo, self.max_segundos, encerrar)
+        amostrador.start()
+
+        def start_response_perfil(status, headers, exc_info=None):
+            headers = list(headers) + [("X-Perfil", os.path.basename(arquivo))]
+            return start_response(status, headers, exc_info)
+
+        try:
+            corpo = self.wsgi_app(environ, start_response_perfil if pelo_token else start_response)
+        except BaseException:
+            encerrar()
+            raise
+        return _RespostaPerfilada(corpo, encerrar)
+
+    def _gravar(self, arquivo, amostrador, environ, duracao):
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(arquivo, "w", encoding="utf-8") as saida:
+            # Comentários no topo; flamegraph.pl ignora linhas sem contagem
+            consulta = environ.get("QUERY_STRING")
+            saida.write(f"# {environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+                        f"{'?' + consulta if consulta else ''} {duracao * 1000:.1f} ms, "
+                        f"{amostrador.amostras} amostras a cada {self.intervalo * 1000:.0f} ms\n")
+            for pilha, quantidade in amostrador.pilhas.most_common():
+                saida.write(f"{pilha} {quantidade}\n")
+        self._limpar()
+
+    def _limpar(self):
+        perfis = sorted(
+            (os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio)
+             if nome.endswith(".folded")),
+            key=os.path.getmtime,
+        )
+        for antigo in perfis[:-self.max_arquivos] if self.max_arquivos > 0 else []:
+            os.remove(antigo)
@@ -0,0 +1,36 @@
+"""
+Política de hash de senhas compartilhada pelos dois apps.
+
+O algoritmo e o custo vêm da configuração (SENHA_HASH_METODO), no formato
+do Werkzeug: "pbkdf2:sha256:<iterações>" ou "scrypt:<n>:<r>:<p>". Hashes
+gravados com outro método são refeitos no próximo login bem-sucedido, então
+mudar o custo não exige resetar senhas. Use benchmarks/senhas.py para
+escolher um custo que caiba no SLO de latência do login.
+"""
+
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+METODO_PADRAO = 'pbkdf2:sha256:600000'
+
+
+@lru_cache(maxsize=8)
+def _prefixo(metodo):
+    # O Werkzeug completa parâmetros omitidos ("pbkdf2" -> "pbkdf2:sha256:600000");
+    # o prefixo de um hash real é a forma canônica para comparar
+    return generate_password_hash('', method=metodo).split('$', 1)[0]
+
+
+def gerar_hash(senha, metodo=METODO_PADRAO):
+    return generate_password_hash(senha, method=metodo)
+
+
+def verificar_senha(hash_armazenado, senha):
+    return check_password_hash(hash_armazenado, senha)
+
+
+def precisa_rehash(hash_armazenado, metodo=METODO_PADRAO):
+    """True se o hash foi gerado com um método/custo diferente do configurado."""
+    return hash_armazenado.split('$', 1)[0] != _prefixo(metodo)
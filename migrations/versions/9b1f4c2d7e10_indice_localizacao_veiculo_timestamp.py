@@ -0,0 +1,25 @@
+"""Indice (veiculo_id, timestamp) em localizacao
+
+Revision ID: 9b1f4c2d7e10
+Revises: 583c0d9d3975
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1f4c2d7e10'
+down_revision = '583c0d9d3975'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_localizacao_veiculo_timestamp', 'localizacao',
+                    ['veiculo_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_localizacao_veiculo_timestamp', table_name='localizacao')
@@ -0,0 +1,100 @@
+"""Particiona localizacao por mes de timestamp (PostgreSQL)
+
+Revision ID: d7a3b5e91c04
+Revises: c4e8a1f0b6d2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3b5e91c04'
+down_revision = 'c4e8a1f0b6d2'
+branch_labels = None
+depends_on = None
+
+
+# Partições criadas além do mês atual; as seguintes vêm de "flask particoes criar"
+MESES_A_FRENTE = 3
+
+
+def _inicio_do_mes(data, deslocamento=0):
+    total = data.year * 12 + (data.month - 1) + deslocamento
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # Particionamento nativo só existe no PostgreSQL; no SQLite a tabela fica como está
+        return
+
+    op.execute('ALTER TABLE localizacao RENAME TO localizacao_antiga')
+    op.execute('ALTER INDEX ix_localizacao_veiculo_timestamp RENAME TO ix_localizacao_antiga_veiculo_timestamp')
+
+    # A chave primária de uma tabela particionada precisa incluir a chave de partição
+    op.execute("""
+        CREATE TABLE localizacao (
+            id integer NOT NULL DEFAULT nextval('localizacao_id_seq'::regclass),
+            veiculo_id integer NOT NULL REFERENCES veiculo (id),
+            latitude double precision NOT NULL,
+            longitude double precision NOT NULL,
+            "timestamp" timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+    # Criado no pai, o índice é replicado em cada partição
+    op.execute('CREATE INDEX ix_localizacao_veiculo_timestamp ON localizacao (veiculo_id, "timestamp")')
+    op.execute('CREATE TABLE localizacao_padrao PARTITION OF localizacao DEFAULT')
+
+    menor, maior = bind.execute(sa.text(
+        'SELECT min("timestamp"), max("timestamp") FROM localizacao_antiga'
+    )).first()
+    hoje = date.today()
+    mes = _inicio_do_mes(min(menor.date(), hoje) if menor else hoje)
+    ultimo = _inicio_do_mes(max(maior.date(), hoje) if maior else hoje, MESES_A_FRENTE)
+    while mes <= ultimo:
+        seguinte = _inicio_do_mes(mes, 1)
+        op.execute(
+            f"CREATE TABLE localizacao_{mes.year:04d}_{mes.month:02d} PARTITION OF localizacao "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{seguinte.isoformat()}')"
+        )
+        mes = seguinte
+
+    op.execute("""
+        INSERT INTO localizacao (id, veiculo_id, latitude, longitude, "timestamp")
+        SELECT id, veiculo_id, latitude, longitude, coalesce("timestamp", now() AT TIME ZONE 'utc')
+        FROM localizacao_antiga
+    """)
+    op.execute('ALTER SEQUENCE localizacao_id_seq OWNED BY localizacao.id')
+    op.execute('DROP TABLE localizacao_antiga')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE localizacao RENAME TO localizacao_particionada')
+    op.execute('ALTER INDEX ix_localizacao_veiculo_timestamp RENAME TO ix_localizacao_particionada_veiculo_timestamp')
+    op.execute("""
+        CREATE TABLE localizacao (
+            id integer NOT NULL DEFAULT nextval('localizacao_id_seq'::regclass) PRIMARY KEY,
+            veiculo_id integer NOT NULL REFERENCES veiculo (id),
+            latitude double precision NOT NULL,
+            longitude double precision NOT NULL,
+            "timestamp" timestamp without time zone
+        )
+    """)
+    op.execute("""
+        INSERT INTO localizacao (id, veiculo_id, latitude, longitude, "timestamp")
+        SELECT id, veiculo_id, latitude, longitude, "timestamp" FROM localizacao_particionada
+    """)
+    op.execute('CREATE INDEX ix_localizacao_veiculo_timestamp ON localizacao (veiculo_id, "timestamp")')
+    op.execute('ALTER SEQUENCE localizacao_id_seq OWNED BY localizacao.id')
+    # Remove o pai e todas as partições
+    op.execute('DROP TABLE localizacao_particionada')
@@ -6,13 +6,22 @@
 
 # Configurações para WINDOWS
 
+import signal
+import sys
+
 from waitress import serve
 from app import app
 from app import app, db
+from app.particoes import criar_particoes, particionada
 
 with app.app_context():
     db.create_all()
+    # Garante as partições dos próximos meses de localizacao (só no PostgreSQL)
+    if particionada():
+        criar_particoes()
 
 
 if __name__ == "__main__":
+    # SIGTERM vira SystemExit para o atexit gravar a fila de ingestão pendente
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     serve(app, host='0.0.0.0', port=8000)
@@ -5,7 +5,13 @@ class CarroService {
   // ✅ Usa a API real para listar carros
   async listarCarros(filtros = {}) {
     try {
-      const response = await get('/api/carros', { params: filtros })
+      // O campo de busca da tela vira a busca textual da API (?q=) e
+      // ordenar/ordem viram o sort= (ex: preco_asc); data_criacao é o padrão da API
+      const { busca, ordenar, ordem, ...outrosFiltros } = filtros
+      const params = { ...outrosFiltros }
+      if (busca) params.q = busca
+      if (ordenar && ordenar !== 'data_criacao') params.sort = `${ordenar}_${ordem || 'desc'}`
+      const response = await get('/api/carros', { params })
       
       // O backend deve retornar um array ou um objeto com { carros, total }
       if (Array.isArray(response.data)) {
@@ -15,9 +21,11 @@ class CarroService {
         }
       }
 
+      // A API pagina por cursor: proximo_cursor vem null na última página
       return {
         carros: response.data.carros || [],
-        total: response.data.total || 0
+        total: response.data.total || 0,
+        proximoCursor: response.data.proximo_cursor || null
       }
     } catch (error) {
       console.warn('⚠️ Falha ao buscar carros na API, usando mock:', error)
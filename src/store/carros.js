@@ -16,7 +16,9 @@ export const useCarrosStore = defineStore('carros', {
       ordem: 'desc'
     },
     carregando: false,
-    total: 0
+    carregandoMais: false,
+    total: 0,
+    proximoCursor: null
   }),
 
   getters: {
@@ -42,6 +44,7 @@ export const useCarrosStore = defineStore('carros', {
           : resultado.carros || []
 
         this.total = resultado.total || this.carros.length
+        this.proximoCursor = resultado.proximoCursor || null
       } catch (error) {
         console.error('Erro ao carregar carros:', error)
         const mensagem =
@@ -53,6 +56,28 @@ export const useCarrosStore = defineStore('carros', {
       }
     },
 
+    // Busca a próxima página usando o cursor devolvido pela API
+    async carregarMais() {
+      if (!this.proximoCursor || this.carregandoMais) return
+
+      const uiStore = useUiStore()
+      this.carregandoMais = true
+      try {
+        const resultado = await CarroService.listarCarros({
+          ...this.filtros,
+          cursor: this.proximoCursor
+        })
+        this.carros = [...this.carros, ...(resultado.carros || [])]
+        this.proximoCursor = resultado.proximoCursor || null
+      } catch (error) {
+        const mensagem =
+          error.response?.data?.message || MENSAGENS_ERRO.ERRO_GENERICO
+        uiStore.mostrarToast(mensagem, 'danger')
+      } finally {
+        this.carregandoMais = false
+      }
+    },
+
     async buscarCarro(id) {
       const uiStore = useUiStore()
       this.carregando = true